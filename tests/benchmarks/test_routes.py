@@ -0,0 +1,281 @@
+"""Бюджеты запросов к БД и времени для всех именованных адресов posts и users.
+
+Запуск: pytest -m benchmark. Для каждого адреса на одном и том же наборе
+данных (generate_dataset с фиксированным seed) измеряются число запросов
+к БД, их время, время отрисовки шаблона и полное время ответа при пустом
+кеше; результат сравнивается с baselines.json. Число запросов не должно
+расти; время может быть больше базового не более чем в
+--benchmark-tolerance раз (плюс SLACK_MS на шум). После намеренных
+изменений базу обновляют: pytest -m benchmark --benchmark-update.
+"""
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from io import StringIO
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template.backends.django import Template
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+pytestmark = pytest.mark.benchmark
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+PREFIX = 'bench'
+RUNS = 5
+SLACK_MS = 10
+METRICS = ('queries', 'db_ms', 'render_ms', 'total_ms')
+
+
+def _author():
+    return get_user_model().objects.get(username=f'{PREFIX}_0')
+
+
+def _post():
+    return _author().posts.order_by('pk').first()
+
+
+def _other():
+    return get_user_model().objects.get(username=f'{PREFIX}_1')
+
+
+def _reset_args():
+    user = _author()
+    return [
+        urlsafe_base64_encode(force_bytes(user.pk)),
+        default_token_generator.make_token(user),
+    ]
+
+
+# Адрес -> (аргументы, вход автора, метод, данные запроса).
+SCENARIOS = {
+    'posts:index': (list, False, 'get', None),
+    'posts:group_list': (
+        lambda: [_post().group.slug if _post().group else f'{PREFIX}-0'],
+        False, 'get', None,
+    ),
+    'posts:profile': (lambda: [_author().username], False, 'get', None),
+    'posts:post_detail': (lambda: [_post().pk], False, 'get', None),
+    'posts:post_comments': (lambda: [_post().pk], False, 'get', None),
+    'posts:post_edit': (lambda: [_post().pk], True, 'get', None),
+    'posts:add_comment': (
+        lambda: [_post().pk], True, 'post', {'text': 'Комментарий'}
+    ),
+    'posts:post_create': (list, True, 'get', None),
+    'posts:search': (
+        list, False, 'get', lambda: {'q': _post().text.split()[0]}
+    ),
+    'posts:follow_index': (list, True, 'get', None),
+    'posts:profile_follow': (
+        lambda: [_other().username], True, 'post', None
+    ),
+    'posts:profile_unfollow': (
+        lambda: [_other().username], True, 'post', None
+    ),
+    'users:login': (list, False, 'get', None),
+    'users:logout': (list, True, 'get', None),
+    'users:signup': (list, False, 'get', None),
+    'users:password_reset_form': (list, False, 'get', None),
+    'users:password_reset_done': (list, False, 'get', None),
+    'users:password_reset_confirm': (_reset_args, False, 'get', None),
+    'users:password_change_form': (list, True, 'get', None),
+}
+
+
+def named_routes():
+    from posts.urls import app_name as posts_app, urlpatterns as posts_urls
+    from users.urls import app_name as users_app, urlpatterns as users_urls
+
+    return sorted(
+        f'{app}:{pattern.name}'
+        for app, patterns in ((posts_app, posts_urls), (users_app, users_urls))
+        for pattern in patterns
+        if pattern.name
+    )
+
+
+@pytest.fixture(scope='module')
+def dataset(django_db_setup, django_db_blocker):
+    media_root = tempfile.mkdtemp()
+    with override_settings(MEDIA_ROOT=media_root, THUMBNAIL_ASYNC=False):
+        with django_db_blocker.unblock():
+            call_command(
+                'generate_dataset',
+                users=40,
+                groups=5,
+                posts=300,
+                comments=3,
+                images=0.3,
+                image_files=2,
+                seed=1,
+                prefix=PREFIX,
+                stdout=StringIO(),
+            )
+            yield
+            get_user_model().objects.filter(
+                username__startswith=f'{PREFIX}_'
+            ).delete()
+            from posts.models import Group
+
+            Group.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+    shutil.rmtree(media_root, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def results(request):
+    measured = {}
+    yield measured
+    if request.config.getoption('--benchmark-update') and measured:
+        baselines = load_baselines()
+        baselines.update(measured)
+        with open(BASELINES, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES, encoding='utf-8') as file:
+        return json.load(file)
+
+
+class QueryTimer:
+    """Обёртка execute(): число запросов и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+def measure(route, monkeypatch):
+    build_args, login, method, data = SCENARIOS[route]
+    client = Client()
+    if login:
+        client.force_login(_author())
+    url = reverse(route, args=build_args())
+    if callable(data):
+        data = data()
+    render = []
+    original = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            render[-1] += time.perf_counter() - start
+
+    monkeypatch.setattr(Template, 'render', timed_render)
+    runs = []
+    # Первый запрос прогревает шаблоны и импорты и не учитывается.
+    for run in range(RUNS + 1):
+        if login and route == 'users:logout':
+            client.force_login(_author())
+        cache.clear()
+        render.append(0)
+        queries = QueryTimer()
+        with connection.execute_wrapper(queries):
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            total = time.perf_counter() - start
+        assert response.status_code < 400, (
+            f'{route}: ответ {response.status_code}'
+        )
+        if run:
+            runs.append({
+                'queries': queries.count,
+                'db_ms': queries.seconds * 1000,
+                'render_ms': render[-1] * 1000,
+                'total_ms': total * 1000,
+            })
+    return {
+        'queries': max(r['queries'] for r in runs),
+        **{
+            metric: round(statistics.median(r[metric] for r in runs), 2)
+            for metric in METRICS[1:]
+        },
+    }
+
+
+def test_every_route_has_scenario():
+    """Для каждого именованного адреса posts и users есть сценарий."""
+
+    missing = set(named_routes()) - set(SCENARIOS)
+    assert not missing, (
+        f'Добавьте сценарии в tests/benchmarks/test_routes.py: {missing}'
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('route', sorted(SCENARIOS))
+def test_route_budget(route, dataset, results, monkeypatch, request):
+    measured = measure(route, monkeypatch)
+    results[route] = measured
+    if request.config.getoption('--benchmark-update'):
+        return
+    baseline = load_baselines().get(route)
+    assert baseline is not None, (
+        f'{route}: нет базовых значений, запустите '
+        f'pytest -m benchmark --benchmark-update'
+    )
+    assert measured['queries'] <= baseline['queries'], (
+        f'{route}: запросов к БД {measured["queries"]}, '
+        f'бюджет {baseline["queries"]}'
+    )
+    tolerance = request.config.getoption('--benchmark-tolerance')
+    for metric in METRICS[1:]:
+        budget = baseline[metric] * tolerance + SLACK_MS
+        assert measured[metric] <= budget, (
+            f'{route}: {metric} = {measured[metric]:.1f}, '
+            f'бюджет {budget:.1f} ({baseline[metric]:.1f} x {tolerance})'
+        )
+
+
+@pytest.mark.django_db
+def test_thread_depth_queries(dataset):
+    """Страница поста делает одно число запросов при любой глубине веток."""
+    from django.conf import settings
+    from posts.models import Comment
+
+    client = Client()
+    post = _post()
+    url = reverse('posts:post_detail', args=[post.pk])
+    counts = {}
+    for depth in range(settings.COMMENT_MAX_DEPTH + 1):
+        comment = None
+        for level in range(depth + 1):
+            comment = Comment.objects.create(
+                text=f'Ветка {depth}, уровень {level}',
+                author=_other(),
+                post=post,
+                parent=comment,
+            )
+        cache.clear()
+        queries = QueryTimer()
+        with connection.execute_wrapper(queries):
+            assert client.get(url).status_code == 200
+        counts[depth] = queries.count
+    assert len(set(counts.values())) == 1, (
+        f'Запросов к БД по глубине веток: {counts}'
+    )
@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -33,7 +35,31 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark', 'бюджеты адресов (tests/benchmarks)')
+    group.addoption(
+        '--benchmark-update',
+        action='store_true',
+        help='Записать измерения в tests/benchmarks/baselines.json',
+    )
+    group.addoption(
+        '--benchmark-tolerance',
+        type=float,
+        default=3.0,
+        help='Во сколько раз время может превышать базовое',
+    )
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_in_process(settings, tmp_path):
+    # Загрузки и миниатюры пишутся во временный MEDIA_ROOT, а не в рабочее
+    # дерево. Миниатюры создаются сразу, а не в фоне: иначе поток пула
+    # может писать в каталог, который pytest уже удаляет.
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.THUMBNAIL_ASYNC = False
@@ -0,0 +1,107 @@
+"""Защита кеша от одновременного пересчёта (cache stampede).
+
+get_or_set() хранит рядом со значением момент, до которого оно свежее, и
+время его вычисления. Значение пересчитывает только процесс, взявший
+блокировку (cache.add), остальные:
+
+* при устаревшем значении сразу отдают его (stale-while-revalidate);
+* при пустом кеше ждут, пока значение появится, и считают его сами,
+  если блокировку сняли без значения (ошибка или None) или ожидание
+  истекло.
+
+Кроме того, незадолго до устаревания значение пересчитывается с
+вероятностью, растущей к моменту устаревания (probabilistic early
+expiration, XFetch): так обновление обычно происходит до того, как запись
+устареет у всех сразу.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache
+
+from .metrics import record_cache
+
+LOCK_SUFFIX = ':lock'
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+BETA = 1.0
+
+
+def _refresh_early(fresh_until, delta, beta):
+    # XFetch: delta * beta * -log(rand) — случайный сдвиг момента
+    # устаревания тем больше, чем дольше считается значение.
+    if beta <= 0 or delta <= 0:
+        return False
+    shift = delta * beta * -math.log(1.0 - random.random())
+    return time.time() + shift >= fresh_until
+
+
+def _wait(cache, key, lock_key, timeout):
+    """Ждёт значение, пока его считает владелец блокировки.
+
+    Блокировка снята, а значения нет — вычисление упало или вернуло None:
+    ждать дальше нечего.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        found = cache.get_many([key, lock_key])
+        if key in found:
+            return found[key]
+        if lock_key not in found:
+            return None
+    return None
+
+
+def _compute(cache, key, compute, timeout, fresh_for):
+    start = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - start
+    if value is not None:
+        cache.set(key, (value, time.time() + fresh_for, delta), timeout)
+    return value
+
+
+def get_or_set(
+    key,
+    compute,
+    timeout,
+    fresh_for=None,
+    beta=BETA,
+    cache=None,
+    lock_timeout=LOCK_TIMEOUT,
+    wait_timeout=WAIT_TIMEOUT,
+):
+    """Возвращает значение по ключу, вычисляя его через compute().
+
+    Запись хранится timeout секунд и считается свежей fresh_for секунд
+    (по умолчанию столько же). Если compute() вернул None, значение не
+    кешируется.
+    """
+    cache = cache or default_cache
+    if fresh_for is None:
+        fresh_for = timeout
+    lock_key = key + LOCK_SUFFIX
+
+    entry = cache.get(key)
+    record_cache(entry is not None)
+    if entry is not None:
+        value, fresh_until, delta = entry
+        if time.time() < fresh_until and not _refresh_early(
+            fresh_until, delta, beta
+        ):
+            return value
+        if not cache.add(lock_key, 1, lock_timeout):
+            return value
+    elif not cache.add(lock_key, 1, lock_timeout):
+        entry = _wait(cache, key, lock_key, wait_timeout)
+        if entry is not None:
+            return entry[0]
+        return _compute(cache, key, compute, timeout, fresh_for)
+
+    try:
+        return _compute(cache, key, compute, timeout, fresh_for)
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,306 @@
+"""Метрики запросов: время ответа, запросы к БД, отрисовка шаблонов, кеш.
+
+PerformanceMiddleware (core.middleware) для выбранных запросов создаёт
+RequestMetrics и делает его текущим: в него пишут обёртка execute() всех
+подключений к БД, Template.render() (см. instrument_templates),
+core.cache.get_or_set (record_cache) и кеш страниц гостей
+(record_page_cache). Для остальных запросов текущего
+объекта нет, и всё это сводится к одной проверке.
+
+Итоги по видам копятся в registry своего процесса и не чаще раза в
+PERFORMANCE_METRICS_FLUSH секунд выгружаются в общий кеш, откуда их
+собирает /metrics/ — так в ответе видны все процессы gunicorn.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+from collections import defaultdict
+
+from django.core.cache import cache as default_cache
+
+# Границы корзин гистограммы времени ответа, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CACHE_KEY = 'metrics'
+UNRESOLVED = '<unresolved>'
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса; сам объект — обёртка execute() для БД."""
+
+    __slots__ = (
+        'queries', 'db_time', 'render_time', 'cache_hits', 'cache_misses',
+        'page_cache', 'rendering',
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 'hit' или 'miss', если страница шла через кеш страниц.
+        self.page_cache = None
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, длительности в миллисекундах."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.render_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+def activate(metrics):
+    """Делает metrics текущим; возвращает токен для deactivate()."""
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def record_page_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.page_cache = 'hit' if hit else 'miss'
+
+
+def instrument_templates():
+    """Оборачивает Template.render() бэкенда DjangoTemplates.
+
+    Учитывается только внешняя отрисовка: render_to_string() внутри
+    шаблона уже входит в её время.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics.rendering:
+            return original(self, context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.render_time += time.perf_counter() - start
+            metrics.rendering = False
+
+    render.instrumented = True
+    Template.render = render
+
+
+def _view_stats():
+    return {
+        'requests': defaultdict(int),
+        'buckets': [0] * len(BUCKETS),
+        'count': 0,
+        'duration': 0.0,
+        'queries': 0,
+        'db_duration': 0.0,
+        'render_duration': 0.0,
+        'cache_hit': 0,
+        'cache_miss': 0,
+        'page_cache_hit': 0,
+        'page_cache_miss': 0,
+    }
+
+
+class Registry:
+    """Итоги по видам в этом процессе."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(_view_stats)
+        self.flushed = 0.0
+
+    def observe(self, view, status, total, metrics):
+        with self.lock:
+            stats = self.views[view]
+            stats['requests'][status] += 1
+            index = bisect.bisect_left(BUCKETS, total)
+            if index < len(BUCKETS):
+                stats['buckets'][index] += 1
+            stats['count'] += 1
+            stats['duration'] += total
+            stats['queries'] += metrics.queries
+            stats['db_duration'] += metrics.db_time
+            stats['render_duration'] += metrics.render_time
+            stats['cache_hit'] += metrics.cache_hits
+            stats['cache_miss'] += metrics.cache_misses
+            if metrics.page_cache:
+                stats[f'page_cache_{metrics.page_cache}'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                view: {
+                    **stats,
+                    'requests': dict(stats['requests']),
+                    'buckets': list(stats['buckets']),
+                }
+                for view, stats in self.views.items()
+            }
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+            self.flushed = 0.0
+
+    def flush(self, interval, timeout, cache=None, force=False):
+        """Выгружает итоги процесса в общий кеш не чаще раза в interval с."""
+        now = time.monotonic()
+        if not force and now - self.flushed < interval:
+            return False
+        self.flushed = now
+        cache = cache or default_cache
+        pid = os.getpid()
+        cache.set(f'{CACHE_KEY}:{pid}', self.snapshot(), timeout)
+        # Список процессов обновляется без блокировки: потерянный при гонке
+        # процесс добавит себя при следующей выгрузке.
+        pids = cache.get(CACHE_KEY) or []
+        if pid not in pids:
+            cache.set(CACHE_KEY, [*pids, pid][-100:], None)
+        return True
+
+
+registry = Registry()
+
+
+def collect(cache=None):
+    """Итоги всех процессов из общего кеша, сложенные по видам."""
+    cache = cache or default_cache
+    pids = cache.get(CACHE_KEY) or []
+    snapshots = cache.get_many([f'{CACHE_KEY}:{pid}' for pid in pids])
+    alive = [pid for pid in pids if f'{CACHE_KEY}:{pid}' in snapshots]
+    if alive != pids:
+        cache.set(CACHE_KEY, alive, None)
+    views = defaultdict(_view_stats)
+    for snapshot in snapshots.values():
+        for view, stats in snapshot.items():
+            total = views[view]
+            for status, count in stats['requests'].items():
+                total['requests'][status] += count
+            total['buckets'] = [
+                a + b for a, b in zip(total['buckets'], stats['buckets'])
+            ]
+            for name in total:
+                if name not in ('requests', 'buckets'):
+                    # Выгрузка процесса прежней версии может не знать поля.
+                    total[name] += stats.get(name, 0)
+    return views
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"'),
+        )
+        for name, value in labels.items()
+    )
+
+
+# Счётчики с одной меткой view: имя метрики, поле итогов, описание.
+COUNTERS = (
+    ('db_queries_total', 'queries', 'Число запросов к БД.'),
+    ('db_duration_seconds_total', 'db_duration', 'Время запросов к БД.'),
+    (
+        'template_render_seconds_total', 'render_duration',
+        'Время отрисовки шаблонов.',
+    ),
+)
+
+
+# Счётчики с метками view и result (hit, miss): имя, начало поля итогов.
+RESULT_COUNTERS = (
+    (
+        'cache_requests_total', 'cache_',
+        'Обращения к кешу через get_or_set.',
+    ),
+    (
+        'page_cache_total', 'page_cache_',
+        'Ответы гостям из кеша страниц.',
+    ),
+)
+
+
+def _header(lines, metric, kind, help_text):
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} {kind}')
+
+
+def _result_counter(lines, metric, key, help_text, views):
+    _header(lines, metric, 'counter', help_text)
+    for view, stats in views:
+        for result in ('hit', 'miss'):
+            labels = _labels(view=view, result=result)
+            lines.append(f'{metric}{{{labels}}} {stats[key + result]}')
+
+
+def render_prometheus(views, prefix='yatube'):
+    """Итоги по видам в текстовом формате Prometheus (version 0.0.4)."""
+    views = sorted(views.items())
+    lines = []
+
+    metric = f'{prefix}_requests_total'
+    _header(lines, metric, 'counter', 'Число ответов по видам и кодам.')
+    for view, stats in views:
+        for status, count in sorted(stats['requests'].items()):
+            labels = _labels(view=view, status=status)
+            lines.append(f'{metric}{{{labels}}} {count}')
+
+    metric = f'{prefix}_request_duration_seconds'
+    _header(lines, metric, 'histogram', 'Полное время ответа, секунды.')
+    for view, stats in views:
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            labels = _labels(view=view, le=bound)
+            lines.append(f'{metric}_bucket{{{labels}}} {cumulative}')
+        labels = _labels(view=view, le='+Inf')
+        lines.append(f'{metric}_bucket{{{labels}}} {stats["count"]}')
+        labels = _labels(view=view)
+        lines.append(f'{metric}_sum{{{labels}}} {stats["duration"]:.6f}')
+        lines.append(f'{metric}_count{{{labels}}} {stats["count"]}')
+
+    for name, key, help_text in COUNTERS:
+        metric = f'{prefix}_{name}'
+        _header(lines, metric, 'counter', help_text)
+        for view, stats in views:
+            value = stats[key]
+            if isinstance(value, float):
+                value = f'{value:.6f}'
+            lines.append(f'{metric}{{{_labels(view=view)}}} {value}')
+
+    for name, key, help_text in RESULT_COUNTERS:
+        _result_counter(lines, f'{prefix}_{name}', key, help_text, views)
+    return '\n'.join(lines) + '\n'
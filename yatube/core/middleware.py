@@ -0,0 +1,75 @@
+import random
+import time
+
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, querylog
+
+
+class PerformanceMiddleware:
+    """Замеряет долю PERFORMANCE_SAMPLE_RATE запросов (см. core.metrics).
+
+    Для замеренного запроса в ответ добавляется заголовок Server-Timing,
+    а итоги записываются в metrics.registry под именем вида из
+    request.resolver_match. Остальные запросы проходят без изменений.
+    Должен стоять первым в MIDDLEWARE, чтобы время включало остальные.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.instrument_templates()
+
+    def sampled(self):
+        rate = settings.PERFORMANCE_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def __call__(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        recorder = metrics.RequestMetrics()
+        token = metrics.activate(recorder)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else metrics.UNRESOLVED
+        metrics.registry.observe(
+            view, response.status_code, total, recorder
+        )
+        metrics.registry.flush(
+            settings.PERFORMANCE_METRICS_FLUSH,
+            settings.PERFORMANCE_METRICS_TIMEOUT,
+        )
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = recorder.server_timing(total)
+        return response
+
+
+class QueryLogMiddleware:
+    """Журнал медленных запросов к БД и поиск N+1 (см. core.querylog).
+
+    При SLOW_QUERY_MS и NPLUSONE_THRESHOLD, равных нулю, ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (settings.SLOW_QUERY_MS or settings.NPLUSONE_THRESHOLD):
+            return self.get_response(request)
+
+        def view():
+            match = getattr(request, 'resolver_match', None)
+            return match.view_name if match else request.path
+
+        with querylog.watch(view, raise_errors=settings.NPLUSONE_RAISE):
+            return self.get_response(request)
@@ -0,0 +1,149 @@
+"""Журнал медленных запросов к БД и поиск N+1.
+
+QueryInspector — обёртка execute() (connection.execute_wrapper), которую
+QueryLogMiddleware (core.middleware) ставит на время запроса:
+
+* запрос дольше SLOW_QUERY_MS пишется в журнал core.querylog вместе с
+  именем вида и местом, откуда он выполнен;
+* запросы одного вида (SQL без параметров, списки IN свёрнуты) считаются;
+  вид, повторившийся NPLUSONE_THRESHOLD раз, — признак N+1, например
+  comment.author в цикле шаблона без select_related. Такие виды пишутся в
+  журнал в конце запроса, а при NPLUSONE_RAISE вызывают NPlusOneError —
+  так N+1 становятся ошибками тестов.
+
+Место запроса — ближайший кадр стека из кода проекта и, если запрос
+выполнен при отрисовке шаблона, имя шаблона и строка.
+"""
+import logging
+import os
+import re
+import sys
+import time
+
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+# Управление транзакциями повторяется законно и в подсчёт не входит.
+TRANSACTION = re.compile(r'(BEGIN|SAVEPOINT|RELEASE|ROLLBACK)\b', re.I)
+# Файлы самого замера: их кадры местом запроса не считаются.
+SKIP_FILES = tuple(
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('querylog.py', 'metrics.py', 'middleware.py')
+)
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def shape(sql):
+    """SQL без различий в числе параметров списков IN."""
+    return IN_LIST.sub('(%s, ...)', sql)
+
+
+def origin(frame=None):
+    """Откуда выполнен запрос: «файл:строка в функции» и шаблон."""
+    frame = frame or sys._getframe(1)
+    code = template = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            name = getattr(
+                getattr(node, 'origin', None), 'template_name', None
+            )
+            if token is not None and name:
+                template = f'{name}:{token.lineno}'
+        if (
+            code is None
+            and filename.startswith(settings.BASE_DIR)
+            and not filename.startswith(SKIP_FILES)
+            and f'{os.sep}site-packages{os.sep}' not in filename
+        ):
+            code = (
+                f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno} in {frame.f_code.co_name}'
+            )
+        if code and template:
+            break
+        frame = frame.f_back
+    return ', '.join(place for place in (template, code) if place) or '?'
+
+
+class QueryInspector:
+    """Медленные и повторяющиеся запросы в пределах одного запроса."""
+
+    def __init__(self, view=None, slow_ms=None, threshold=None):
+        self.view = view
+        self.slow_ms = (
+            settings.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        )
+        self.threshold = (
+            settings.NPLUSONE_THRESHOLD if threshold is None else threshold
+        )
+        self.shapes = Counter()
+        # Вид запроса -> место, где он повторился threshold-й раз.
+        self.repeated = {}
+
+    def view_name(self):
+        return self.view() if callable(self.view) else self.view
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            if self.slow_ms and ms >= self.slow_ms:
+                logger.warning(
+                    'Медленный запрос %.1f мс, вид %s, %s: %s',
+                    ms, self.view_name(), origin(), sql,
+                )
+            if self.threshold and not TRANSACTION.match(sql):
+                key = shape(sql)
+                self.shapes[key] += 1
+                if self.shapes[key] == self.threshold:
+                    self.repeated[key] = origin()
+
+    def problems(self):
+        """Повторившиеся виды: (число, место, SQL), частые первыми."""
+        return sorted(
+            (
+                (self.shapes[key], place, key)
+                for key, place in self.repeated.items()
+            ),
+            reverse=True,
+        )
+
+    def report(self, raise_errors=False):
+        problems = self.problems()
+        if not problems:
+            return
+        lines = [
+            f'{count} одинаковых запросов, {place}: {sql}'
+            for count, place, sql in problems
+        ]
+        message = f'Возможно N+1, вид {self.view_name()}:\n' + '\n'.join(
+            lines
+        )
+        if raise_errors:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+@contextmanager
+def watch(view=None, raise_errors=False, **options):
+    """Следит за запросами всех подключений к БД внутри блока."""
+    inspector = QueryInspector(view, **options)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
+    inspector.report(raise_errors)
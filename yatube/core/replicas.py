@@ -0,0 +1,112 @@
+"""Чтение с реплик БД.
+
+Реплики — псевдонимы из DATABASE_REPLICAS (см. DB_REPLICA_HOSTS в
+settings). ReplicaRouter отправляет на реплику только чтения внутри
+read_from_replica(), то есть в видах с ReplicaReadMixin; всё остальное,
+и любая запись, идёт в основную БД. На весь запрос выбирается одна
+реплика, чтобы его выборки были согласованы между собой.
+
+Реплика отстаёт от основной БД, поэтому тот, кто только что писал
+(PrimaryWriteMixin), получает cookie PIN_COOKIE и REPLICA_PIN_SECONDS
+читает из основной БД — и видит свои изменения. Кеши страниц и
+фрагментов, общие для всех, заполняются из основной БД
+(read_from_primary).
+"""
+import random
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PIN_COOKIE = 'db_primary'
+# Таблицы, которые читаются с реплики. Пользователи, сессии, ключи
+# картинок sorl и прочее служебное читается из основной БД: только что
+# зарегистрированный или вошедший пользователь должен находиться сразу.
+APPS = {'posts'}
+
+_replica = ContextVar('replica', default=None)
+
+
+@contextmanager
+def _reading(replica):
+    token = _replica.set(replica)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def read_from_replica():
+    """Чтения моделей из APPS внутри блока идут на случайную реплику."""
+    replicas = settings.DATABASE_REPLICAS
+    return _reading(random.choice(replicas) if replicas else None)
+
+
+def read_from_primary():
+    """Чтения внутри блока идут в основную БД, даже в виде с реплики.
+
+    Так заполняются общие кеши: отставшая реплика не должна попасть в
+    кеш под уже новой версией тега и остаться там для всех.
+    """
+    return _reading(None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        # Подсказка instance не учитывается: связанные записи объекта из
+        # основной БД (автора) в виде тоже читаются с реплики.
+        if replica is None or model._meta.app_label not in APPS:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной БД.
+        return True
+
+
+def pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def pin(response):
+    response.set_cookie(
+        PIN_COOKIE,
+        '1',
+        max_age=settings.REPLICA_PIN_SECONDS,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+class ReplicaReadMixin:
+    """Вид читает с реплики, если посетитель недавно не писал."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if pinned(request) or request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # Шаблон с ленивыми выборками рендерится здесь же, на реплике.
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+class PrimaryWriteMixin:
+    """После удачной записи закрепляет посетителя за основной БД."""
+
+    write_methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if (
+            request.method in self.write_methods
+            and response.status_code < 400
+        ):
+            pin(response)
+        return response
@@ -0,0 +1,154 @@
+import shutil
+import tempfile
+import threading
+import time
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import LOCK_SUFFIX, get_or_set
+
+THREADS = 10
+
+
+class GetOrSetTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self, result='value', delay=0.2):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            return result
+        return compute
+
+    def run_concurrently(self, func):
+        """Запускает func одновременно в THREADS потоках."""
+        barrier = threading.Barrier(THREADS)
+        results = [None] * THREADS
+
+        def worker(index):
+            barrier.wait()
+            results[index] = func()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return list(results)
+
+    def test_cold_key_is_computed_once(self):
+        """Пустой ключ вычисляет один поток, остальные ждут результат."""
+
+        results = self.run_concurrently(
+            lambda: get_or_set('key', self.compute(), 60)
+        )
+        self.assertEqual(results, ['value'] * THREADS)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_revalidating(self):
+        """Устаревшее значение отдаётся, пока один поток его обновляет."""
+
+        get_or_set('key', self.compute('old', delay=0), 60, fresh_for=-1)
+        self.calls = 0
+        started = time.monotonic()
+        results = self.run_concurrently(
+            lambda: get_or_set(
+                'key', self.compute('new', delay=0.5), 60, fresh_for=60
+            )
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('new'), 1)
+        self.assertEqual(results.count('old'), THREADS - 1)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(get_or_set('key', self.compute(), 60), 'new')
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение берётся из кеша."""
+
+        get_or_set('key', self.compute(delay=0), 60)
+        get_or_set('key', self.compute(delay=0), 60)
+        self.assertEqual(self.calls, 1)
+
+    def test_early_expiration(self):
+        """Перед устареванием значение может обновиться заранее."""
+
+        get_or_set('key', self.compute('old', delay=0.05), 60, fresh_for=0.1)
+        with mock.patch('core.cache.random.random', return_value=0.0):
+            value = get_or_set('key', self.compute('new', delay=0), 60)
+        self.assertEqual(value, 'old')
+        with mock.patch('core.cache.random.random', return_value=0.9999):
+            value = get_or_set('key', self.compute('new', delay=0), 60)
+        self.assertEqual(value, 'new')
+
+    def test_none_is_not_cached(self):
+        """Результат None не кешируется."""
+
+        get_or_set('key', self.compute(None, delay=0), 60)
+        get_or_set('key', self.compute(None, delay=0), 60)
+        self.assertEqual(self.calls, 2)
+
+    def test_lock_is_released_on_error(self):
+        """Ошибка вычисления не оставляет блокировку."""
+
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            get_or_set('key', fail, 60)
+        self.assertIsNone(cache.get('key' + LOCK_SUFFIX))
+        self.assertEqual(get_or_set('key', self.compute(delay=0), 60),
+                         'value')
+
+    def test_waiters_stop_when_nothing_is_cached(self):
+        """Если вычисление вернуло None, ожидающие не ждут WAIT_TIMEOUT."""
+
+        started = time.monotonic()
+        results = self.run_concurrently(
+            lambda: get_or_set('key', self.compute(None, delay=0.2), 60)
+        )
+        self.assertEqual(results, [None] * THREADS)
+        self.assertLess(time.monotonic() - started, 2)
+
+
+class FileBasedCacheTests(SimpleTestCase):
+    """Файловый кеш — замена общего кеша для нескольких процессов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.location = tempfile.mkdtemp()
+        cls.settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'LOCATION': cls.location,
+                'KEY_PREFIX': 'test',
+            },
+        })
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.location, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_stale_value_is_served_while_locked(self):
+        """Блокировка и устаревшие значения работают через файлы."""
+
+        get_or_set('key', lambda: 'old', 60, fresh_for=-1)
+        cache.add('key' + LOCK_SUFFIX, 1)
+        self.assertEqual(get_or_set('key', lambda: 'new', 60), 'old')
+        cache.delete('key' + LOCK_SUFFIX)
+        self.assertEqual(get_or_set('key', lambda: 'new', 60), 'new')
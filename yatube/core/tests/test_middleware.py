@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+from .. import metrics
+
+User = get_user_model()
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1)
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+
+    def test_server_timing(self):
+        """Ответ замеренного запроса содержит заголовок Server-Timing."""
+
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(name, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('hit=0', timing)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('hit=1', response['Server-Timing'])
+
+    def test_registry(self):
+        """Итоги записываются под именем вида."""
+
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get('/no-such-page/')
+        views = metrics.registry.snapshot()
+        index = views['posts:index']
+        self.assertEqual(index['count'], 2)
+        self.assertEqual(index['requests'], {200: 2})
+        self.assertGreater(index['queries'], 0)
+        self.assertGreater(index['render_duration'], 0)
+        self.assertEqual(index['cache_hit'], 1)
+        self.assertGreater(index['cache_miss'], 0)
+        self.assertEqual(index['page_cache_hit'], 1)
+        self.assertEqual(index['page_cache_miss'], 1)
+        self.assertEqual(
+            views[metrics.UNRESOLVED]['requests'], {404: 1}
+        )
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_sampling_off(self):
+        """При нулевой доле запросы не замеряются."""
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.registry.snapshot(), {})
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=False)
+    def test_server_timing_off(self):
+        """Заголовок можно отключить, итоги всё равно копятся."""
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertIn('posts:index', metrics.registry.snapshot())
+
+    def test_metrics_endpoint(self):
+        """/metrics/ отдаёт итоги в формате Prometheus."""
+
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', body)
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 1', body
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            body,
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{view="posts:index",result="hit"} 0',
+            body,
+        )
+        self.assertIn(
+            'yatube_page_cache_total{view="posts:index",result="miss"} 1',
+            body,
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_access(self):
+        """С чужого адреса /metrics/ доступен только персоналу."""
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(PerformanceMiddlewareTests.staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_collect_merges_processes(self):
+        """Итоги разных процессов из общего кеша складываются."""
+
+        self.client.get(reverse('posts:index'))
+        snapshot = metrics.registry.snapshot()
+        cache.set(f'{metrics.CACHE_KEY}:1', snapshot)
+        cache.set(f'{metrics.CACHE_KEY}:2', snapshot)
+        cache.set(metrics.CACHE_KEY, [1, 2, 3])
+        views = metrics.collect()
+        self.assertEqual(views['posts:index']['count'], 2)
+        self.assertEqual(cache.get(metrics.CACHE_KEY), [1, 2])
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import get_template
+from django.test import TestCase
+from posts.models import Comment, Post
+
+from .. import querylog
+
+User = get_user_model()
+
+
+class QueryLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=User.objects.create_user(username='auth'),
+        )
+        for i in range(5):
+            Comment.objects.create(
+                text='Комментарий',
+                author=User.objects.create_user(username=f'reader_{i}'),
+                post=cls.post,
+            )
+
+    def test_shape(self):
+        """Списки IN разной длины дают один вид запроса."""
+
+        self.assertEqual(
+            querylog.shape('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            querylog.shape('SELECT 1 WHERE id IN (%s)'),
+        )
+
+    def test_slow_query(self):
+        """Медленный запрос пишется в журнал с видом и местом."""
+
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            with querylog.watch('posts:index', slow_ms=1e-6, threshold=0):
+                User.objects.count()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('test_querylog.py', logs.output[0])
+        self.assertIn('COUNT(*)', logs.output[0])
+
+    def test_n_plus_one(self):
+        """Повторяющийся вид запроса вызывает NPlusOneError с шаблоном."""
+
+        template = get_template('posts/includes/comments.html')
+        with self.assertRaisesMessage(
+            querylog.NPlusOneError, 'posts/includes/comments.html:'
+        ):
+            with querylog.watch(
+                'posts:post_detail', raise_errors=True, slow_ms=0, threshold=3
+            ):
+                for comment in QueryLogTests.post.comments.all():
+                    template.render({'comment': comment})
+
+    def test_n_plus_one_logged(self):
+        """Без raise_errors повторы только пишутся в журнал."""
+
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            with querylog.watch(slow_ms=0, threshold=3):
+                for comment in QueryLogTests.post.comments.all():
+                    comment.author.username
+        self.assertIn('5 одинаковых запросов', logs.output[0])
+
+    def test_no_problems(self):
+        """select_related убирает повторы."""
+
+        with querylog.watch(raise_errors=True, slow_ms=0, threshold=3):
+            comments = QueryLogTests.post.comments.select_related('author')
+            for comment in comments:
+                comment.author.username
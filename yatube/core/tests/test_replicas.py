@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+from .. import replicas
+
+User = get_user_model()
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaTests(TestCase):
+    """Две локальные SQLite: основная БД и пустая, «отставшая» реплика."""
+
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': REPLICA,
+        }
+        cls.replica_name = connections[REPLICA].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].creation.destroy_test_db(
+            cls.replica_name, verbosity=0
+        )
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_router(self):
+        """С реплики читаются только посты и только в read_from_replica."""
+
+        self.assertEqual(router.db_for_read(Post), 'default')
+        with replicas.read_from_replica():
+            self.assertEqual(router.db_for_read(Post), REPLICA)
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_read_view_uses_replica(self):
+        """Страница поста читает с реплики, где поста ещё нет."""
+
+        self.client.force_login(ReplicaTests.user)
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': ReplicaTests.post.pk}
+        )
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.cookies[replicas.PIN_COOKIE] = '1'
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_write_pins_to_primary(self):
+        """Автор нового поста сразу видит его, остальные — с реплики."""
+
+        self.client.force_login(ReplicaTests.user)
+        response = self.client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        post = Post.objects.get(text='Новый пост')
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        del self.client.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_follow_get_pins(self):
+        """Подписка по ссылке (GET) тоже закрепляет за основной БД."""
+
+        author = User.objects.create_user(username='author')
+        self.client.force_login(ReplicaTests.user)
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_form_page_not_pinned(self):
+        """Просмотр формы ничего не пишет и не закрепляет."""
+
+        self.client.force_login(ReplicaTests.user)
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_cache_filled_from_primary(self):
+        """Кеш гостя заполняется из основной БД, а не с отставшей реплики."""
+
+        url = reverse('posts:index')
+        Post.objects.create(text='Свежий пост', author=ReplicaTests.user)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Свежий пост')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Свежий пост')
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post
 
 
@@ -16,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идёт по полнотекстовому индексу (posts.search), а не
+        # перебором ILIKE '%...%' по всей таблице.
+        if not search_term:
+            return queryset, False
+        return search.posts(search_term, queryset), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
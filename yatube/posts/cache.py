@@ -0,0 +1,152 @@
+"""Кеширование страниц и фрагментов лент с версиями по тегам.
+
+Ключ страницы или фрагмента строится из версий его тегов ('index',
+'group:<slug>', 'profile:<username>', 'post:<id>'). Сигналы (posts.signals)
+повышают версию тегов, которых коснулось изменение, и старые записи больше
+не находятся; остальные продолжают отдаваться из кеша. Поэтому записи
+могут жить часами и при этом не устаревают.
+"""
+import hashlib
+import logging
+import time
+
+from core.cache import get_or_set
+from core.metrics import record_page_cache
+from core.replicas import read_from_primary
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+TAG_KEY = 'pagecache:tag:{}'
+PAGE_KEY = 'pagecache:page:{}'
+FRAGMENT_KEY = 'fragment:{}:{}'
+
+
+def _tag_key(tag):
+    # В тегах бывают slug и username не в ASCII, а memcached их не примет.
+    return TAG_KEY.format(hashlib.md5(tag.encode()).hexdigest())
+
+
+def tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Новая версия не должна совпасть с версией, вытесненной из
+            # кеша, поэтому начинаем с текущего времени. Версии не истекают:
+            # иначе вместе с ними пропадали бы все записи с этим тегом.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(tags):
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*tags):
+    """Сбрасывает все страницы с любым из тегов.
+
+    Версии повышаются сразу и ещё раз после коммита транзакции: страница,
+    которую другой запрос успел отрисовать по старым данным между первым
+    повышением и коммитом, попадает под уже устаревшую версию.
+    """
+    tags = set(tags)
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+    logger.debug('page cache invalidated: %s', ', '.join(sorted(tags)))
+
+
+def _versioned_hash(values, tags):
+    versions = tag_versions(tags)
+    parts = [str(value) for value in values]
+    parts += [f'{tag}={version}' for tag, version in zip(tags, versions)]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def page_key(request, tags):
+    return PAGE_KEY.format(
+        _versioned_hash([request.get_full_path()], tags)
+    )
+
+
+def fragment(name, tags, vary_on, render):
+    """Возвращает фрагмент из кеша или рендерит его через render().
+
+    Запись живёт FRAGMENT_CACHE_TIMEOUT и через FRAGMENT_CACHE_REFRESH
+    пересчитывается одним процессом (см. core.cache.get_or_set).
+    """
+    def render_primary():
+        with read_from_primary():
+            return render()
+
+    return get_or_set(
+        FRAGMENT_KEY.format(name, _versioned_hash(vary_on, tags)),
+        render_primary,
+        settings.FRAGMENT_CACHE_TIMEOUT,
+        fresh_for=settings.FRAGMENT_CACHE_REFRESH,
+    )
+
+
+class AnonymousPageCacheMixin:
+    """Отдаёт анонимным посетителям готовую страницу из кеша.
+
+    Представление перечисляет теги страницы в get_page_cache_tags();
+    страницы без тегов обновляются раз в PAGE_CACHE_TIMEOUT и ничем не
+    сбрасываются. Пока один процесс пересчитывает страницу, остальные
+    отдают прежнюю или ждут первую (см. core.cache.get_or_set). Страница
+    для кеша строится по основной БД, а не по реплике. Попадания и промахи
+    видны в /metrics/ как yatube_page_cache_total (см. core.metrics).
+    """
+
+    def get_page_cache_tags(self):
+        return []
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_cache_tags'] = self.get_page_cache_tags()
+        return context
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        rendered = []
+
+        def render():
+            with read_from_primary():
+                response = super(AnonymousPageCacheMixin, self).dispatch(
+                    request, *args, **kwargs
+                )
+                if hasattr(response, 'render'):
+                    response.render()
+            rendered.append(response)
+            if response.status_code != 200:
+                return None
+            return (response.content, response['Content-Type'])
+
+        cached = get_or_set(
+            page_key(request, self.get_page_cache_tags()),
+            render,
+            settings.PAGE_CACHE_STALE_TIMEOUT,
+            fresh_for=settings.PAGE_CACHE_TIMEOUT,
+        )
+        if rendered:
+            record_page_cache(False)
+            response = rendered[0]
+            response['X-Page-Cache'] = 'miss'
+            return response
+
+        record_page_cache(True)
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Page-Cache'] = 'hit'
+        return response
@@ -0,0 +1,151 @@
+"""Денормализованные счётчики.
+
+Число постов автора и группы, комментариев к посту, подписчиков и подписок
+пользователя хранятся в полях моделей и меняются атомарным F()-выражением
+в той же транзакции, что и сама запись (см. posts.signals). Команда
+reconcile_counters пересчитывает их по данным, если они разошлись.
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _increment(queryset, **deltas):
+    return queryset.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def change_user(user_id, **deltas):
+    """Меняет счётчики пользователя, создавая их при первом обращении."""
+    if not _increment(UserStats.objects.filter(user_id=user_id), **deltas):
+        reconcile_users(User.objects.filter(pk=user_id))
+
+
+def decrease_user(user_id, **deltas):
+    """Уменьшает счётчики пользователя.
+
+    Отсутствующие счётчики не создаются: так бывает при каскадном удалении
+    самого пользователя.
+    """
+    _increment(
+        UserStats.objects.filter(user_id=user_id),
+        **{field: -delta for field, delta in deltas.items()},
+    )
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _increment(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def change_post(post_id, delta):
+    _increment(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def posts_created(posts):
+    """Учитывает посты, созданные через bulk_create, минуя сигналы."""
+    for author_id, count in Counter(p.author_id for p in posts).items():
+        change_user(author_id, posts_count=count)
+    for group_id, count in Counter(p.group_id for p in posts).items():
+        change_group(group_id, count)
+
+
+def follows_changed(user_id, author_ids, delta):
+    """Учитывает подписки user_id на author_ids, минуя сигналы.
+
+    delta=1 — подписки созданы, delta=-1 — удалены. Счётчики всех авторов
+    меняются одним запросом; недостающие создаются по данным.
+    """
+    change_user(user_id, following_count=delta * len(author_ids))
+    updated = _increment(
+        UserStats.objects.filter(user_id__in=author_ids),
+        followers_count=delta,
+    )
+    if updated < len(author_ids):
+        reconcile_users(User.objects.filter(pk__in=author_ids))
+
+
+def for_user(user):
+    """Счётчики пользователя; создаются по данным, если их ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        reconcile_users(User.objects.filter(pk=user.pk))
+        # Только что созданные счётчики могут ещё не дойти до реплики.
+        return UserStats.objects.using(
+            router.db_for_write(UserStats)
+        ).get(user=user)
+
+
+def _count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def _repair(queryset, **actual):
+    """Исправляет записи, у которых счётчики расходятся с данными."""
+    annotations = {f'actual_{field}': expr for field, expr in actual.items()}
+    drifted = Q()
+    for field in actual:
+        drifted |= ~Q(**{field: F(f'actual_{field}')})
+    # Сверка всегда по основной БД: на реплике может не быть свежих данных.
+    rows = (
+        queryset.using(router.db_for_write(queryset.model))
+        .annotate(**annotations)
+        .filter(drifted)
+        .values('pk', *annotations)
+    )
+    repaired = 0
+    for row in list(rows):
+        queryset.model.objects.filter(pk=row['pk']).update(
+            **{field: row[f'actual_{field}'] for field in actual}
+        )
+        repaired += 1
+    return repaired
+
+
+def reconcile_users(users):
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=pk)
+            for pk in users.filter(stats__isnull=True).values_list(
+                'pk', flat=True
+            )
+        ),
+        ignore_conflicts=True,
+    )
+    return _repair(
+        UserStats.objects.filter(user__in=users.values('pk')),
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+
+
+def reconcile():
+    """Пересчитывает все счётчики; возвращает число исправленных записей."""
+    return {
+        'users': reconcile_users(User.objects.all()),
+        'groups': _repair(
+            Group.objects.all(), posts_count=_count(Post, 'group')
+        ),
+        'posts': _repair(
+            Post.objects.all(), comments_count=_count(Comment, 'post')
+        ),
+    }
@@ -0,0 +1,95 @@
+"""Подписки пачками.
+
+follow и unfollow подписывают читателя на многих авторов или отписывают
+от них пачками по BATCH_SIZE: новые подписки вставляются одним
+bulk_create(ignore_conflicts=True) по ограничению unique follow, лишние
+удаляются одним DELETE. Сигналы Follow при этом не вызываются: счётчики
+(counters.follows_changed) и ленты (timelines) обновляются пачкой в той
+же транзакции.
+
+Подписка, созданная или удалённая параллельно между выборкой и записью,
+может попасть в счётчики дважды; такие расхождения исправляет
+reconcile_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+
+from . import counters, timelines
+from .models import Follow
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def batches(ids):
+    """Пачки по BATCH_SIZE; queryset идёт одним подзапросом целиком."""
+    if isinstance(ids, QuerySet):
+        yield ids
+        return
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def follow(user, author_ids):
+    """Подписывает user на авторов author_ids (id или queryset с pk).
+
+    Несуществующих пользователей, самого user и тех, на кого он уже
+    подписан, пропускает. Возвращает число новых подписок.
+    """
+    created = 0
+    for batch in batches(author_ids):
+        batch = list(
+            User.objects.filter(pk__in=batch)
+            .exclude(pk=user.pk)
+            .exclude(following__user=user)
+            .values_list('pk', flat=True)
+        )
+        if not batch:
+            continue
+        with transaction.atomic():
+            Follow.objects.bulk_create(
+                (Follow(user=user, author_id=pk) for pk in batch),
+                ignore_conflicts=True,
+            )
+            counters.follows_changed(user.pk, batch, 1)
+            timelines.backfill(user.pk, batch)
+            timelines.followers_changed(batch, 1)
+        created += len(batch)
+    return created
+
+
+def unfollow(user, author_ids):
+    """Отписывает user от авторов; возвращает число удалённых подписок."""
+    deleted = 0
+    for batch in batches(author_ids):
+        follows = Follow.objects.filter(user=user, author_id__in=batch)
+        gone = dict(follows.values_list('pk', 'author_id'))
+        if not gone:
+            continue
+        with transaction.atomic():
+            # Удаление без сборщика: зависимых записей у подписок нет, а
+            # сигналы заменяет обновление счётчиков и ленты ниже.
+            Follow.objects.filter(pk__in=list(gone))._raw_delete(follows.db)
+            batch = list(gone.values())
+            counters.follows_changed(user.pk, batch, -1)
+            timelines.remove_authors(user.pk, batch)
+            timelines.followers_changed(batch, -1)
+        deleted += len(gone)
+    return deleted
+
+
+def sync(user, author_ids):
+    """Оставляет подписки user ровно на author_ids; возвращает (+, -)."""
+    author_ids = set(author_ids)
+    with transaction.atomic():
+        extra = set(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        ) - author_ids
+        removed = unfollow(user, extra)
+        added = follow(user, author_ids)
+    return added, removed
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -8,6 +10,15 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        # forms.ImageField только проверяет файл через verify(), не
+        # декодируя пиксели, так что ограничения проверяются до декодирования.
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        images.validate(image)
+        return images.downscale(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
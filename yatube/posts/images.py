@@ -0,0 +1,76 @@
+"""Проверка и уменьшение картинок постов при загрузке.
+
+Размер файла (POST_IMAGE_MAX_BYTES) и число пикселей (POST_IMAGE_MAX_PIXELS)
+проверяются до декодирования: Pillow читает только заголовок, поэтому
+«бомбу распаковки» можно отклонить, не разворачивая её в памяти. Картинки
+больше POST_IMAGE_MAX_SIDE по длинной стороне уменьшаются: для JPEG
+draft() декодирует сразу в уменьшенном масштабе, а thumbnail() сжимает
+остаток через reduce(), не держа в памяти полноразмерную копию.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def validate(file):
+    """Отклоняет слишком большие файлы и картинки по заголовку."""
+    if file.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES)},
+        )
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width = height = None
+    except Exception:
+        # Не картинка: это сообщит forms.ImageField.
+        return
+    finally:
+        file.seek(0)
+    if width is None or width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое разрешение: не больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+
+
+def downscale(file):
+    """Уменьшает картинку до POST_IMAGE_MAX_SIDE по длинной стороне.
+
+    Возвращает новый файл или исходный, если уменьшать не нужно.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    with Image.open(file) as image:
+        format_ = image.format
+        if (
+            max(image.size) <= max_side
+            or format_ not in SAVE_OPTIONS
+            or getattr(image, 'is_animated', False)
+        ):
+            file.seek(0)
+            return file
+        image.draft(image.mode, (max_side, max_side))
+        # Поворот по EXIF применяется сразу: сами метаданные не сохраняются.
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), reducing_gap=2.0)
+        content = BytesIO()
+        image.save(content, format=format_, **SAVE_OPTIONS[format_])
+    return SimpleUploadedFile(
+        file.name,
+        content.getvalue(),
+        content_type=Image.MIME.get(format_),
+    )
@@ -0,0 +1,157 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from posts import timelines
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стратегии ленты подписок (push, pull, hybrid) '
+        'на синтетическом графе подписок. Все данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=300)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument(
+            '--popular',
+            type=int,
+            default=3,
+            help='Сколько авторов подписаны почти всеми читателями',
+        )
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument(
+            '--publish',
+            type=int,
+            default=30,
+            help='Сколько новых постов опубликовать при замере записи',
+        )
+        parser.add_argument('--sample', type=int, default=50)
+        parser.add_argument('--threshold', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def build_graph(self, options):
+        rng = random.Random(options['seed'])
+        prefix = f'feedbench{rng.randrange(10 ** 6)}'
+        User.objects.bulk_create(
+            User(username=f'{prefix}_a{i}')
+            for i in range(options['authors'] + options['popular'])
+        )
+        User.objects.bulk_create(
+            User(username=f'{prefix}_r{i}')
+            for i in range(options['readers'])
+        )
+        authors = list(
+            User.objects.filter(username__startswith=f'{prefix}_a')
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        readers = list(
+            User.objects.filter(username__startswith=f'{prefix}_r')
+            .values_list('pk', flat=True)
+        )
+        popular, regular = (
+            authors[:options['popular']],
+            authors[options['popular']:],
+        )
+
+        follows = []
+        for reader in readers:
+            # Степенное распределение числа подписок на обычных авторов.
+            count = min(len(regular), int(rng.paretovariate(1.2)) * 3)
+            followed = set(rng.sample(regular, count))
+            followed.update(a for a in popular if rng.random() < 0.9)
+            follows.extend(
+                Follow(user_id=reader, author_id=author)
+                for author in followed
+            )
+        Follow.objects.bulk_create(follows, batch_size=timelines.BATCH_SIZE)
+        Post.objects.bulk_create(
+            (
+                Post(text=f'Пост {n} автора {author}', author_id=author)
+                for author in authors
+                for n in range(options['posts_per_author'])
+            ),
+            batch_size=timelines.BATCH_SIZE,
+        )
+        return rng, authors, popular, readers, len(follows)
+
+    def measure(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries)
+
+    def run_strategy(self, rng, authors, popular, readers, options):
+        sample = rng.sample(readers, min(options['sample'], len(readers)))
+        rebuild_time, _ = self.measure(
+            lambda: [timelines.rebuild(reader) for reader in readers]
+        )
+        publishers = [
+            popular[n % len(popular)] if popular and n % 3 == 0
+            else rng.choice(authors)
+            for n in range(options['publish'])
+        ]
+        write_time, write_queries = self.measure(
+            lambda: [
+                Post.objects.create(text='Новый пост', author_id=author)
+                for author in publishers
+            ]
+        )
+        users = {user.pk: user for user in User.objects.filter(pk__in=sample)}
+        read_time, read_queries = self.measure(
+            lambda: [
+                timelines.paginator(users[reader], PAGE_SIZE).cursor_page()
+                for reader in sample
+            ]
+        )
+        return {
+            'rebuild_s': rebuild_time,
+            'write_ms_per_post': write_time * 1000 / len(publishers),
+            'write_queries_per_post': write_queries / len(publishers),
+            'read_ms_per_page': read_time * 1000 / len(sample),
+            'read_queries_per_page': read_queries / len(sample),
+        }
+
+    def handle(self, *args, **options):
+        threshold = options['threshold'] or max(
+            2, int(options['readers'] * 0.5)
+        )
+        results = {}
+        with transaction.atomic():
+            rng, authors, popular, readers, follows = self.build_graph(
+                options
+            )
+            self.stdout.write(
+                f'Граф: {len(readers)} читателей, {len(authors)} авторов, '
+                f'{follows} подписок, порог hybrid: {threshold}'
+            )
+            for name in (timelines.PUSH, timelines.PULL, timelines.HYBRID):
+                with override_settings(
+                    FOLLOW_FEED_STRATEGY=name,
+                    TIMELINE_FANOUT_THRESHOLD=threshold,
+                ):
+                    results[name] = self.run_strategy(
+                        rng, authors, popular, readers, options
+                    )
+            transaction.set_rollback(True)
+
+        columns = list(results[timelines.PUSH])
+        self.stdout.write(
+            'strategy'.ljust(10) + ''.join(c.rjust(24) for c in columns)
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                name.ljust(10)
+                + ''.join(f'{row[c]:24.3f}' for c in columns)
+            )
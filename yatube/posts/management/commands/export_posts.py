@@ -0,0 +1,62 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'потоком в JSON Lines или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help=(
+                'Файл .jsonl («-» — stdout) или каталог для CSV-файлов'
+            ),
+        )
+        parser.add_argument(
+            '--format',
+            choices=transfer.FORMATS,
+            help='Формат; по умолчанию по пути',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из БД за раз',
+        )
+
+    def progress(self, name, count):
+        if self.verbosity > 1:
+            self.stderr.write(f'{name}: {count}')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        format_ = options['format'] or transfer.detect_format(path)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        start = time.perf_counter()
+        if format_ == transfer.CSV:
+            if path == '-':
+                raise CommandError('CSV выгружается только в каталог')
+            counts = transfer.write_csv(path, batch_size, self.progress)
+        elif path == '-':
+            counts = transfer.write_jsonl(
+                sys.stdout, batch_size, self.progress
+            )
+        else:
+            with open(path, 'w', encoding='utf-8') as file:
+                counts = transfer.write_jsonl(
+                    file, batch_size, self.progress
+                )
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f'{name}: {n}' for name, n in counts.items())
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено {summary or "ничего"} за {elapsed:.2f} с'
+        ))
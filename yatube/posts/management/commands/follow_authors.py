@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from posts import follows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Подписывает пользователя на авторов или отписывает пачкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Читатель')
+        parser.add_argument(
+            'authors',
+            nargs='*',
+            help='Авторы; можно также передать файлом через --file',
+        )
+        parser.add_argument(
+            '--file',
+            help='Файл с именами авторов, по одному в строке',
+        )
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            '--unfollow', action='store_true', help='Отписать от авторов'
+        )
+        action.add_argument(
+            '--sync',
+            action='store_true',
+            help='Оставить подписки ровно на этих авторов',
+        )
+
+    def author_ids(self, usernames):
+        ids = []
+        for batch in follows.batches(usernames):
+            ids.extend(
+                User.objects.filter(username__in=batch).values_list(
+                    'pk', flat=True
+                )
+            )
+        return ids
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        usernames = set(options['authors'])
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as file:
+                usernames.update(line.strip() for line in file)
+        usernames.discard('')
+        author_ids = self.author_ids(usernames)
+        if len(author_ids) < len(usernames):
+            self.stderr.write(
+                f'Не найдено авторов: {len(usernames) - len(author_ids)}'
+            )
+        if options['sync']:
+            added, removed = follows.sync(user, author_ids)
+        elif options['unfollow']:
+            added, removed = 0, follows.unfollow(user, author_ids)
+        else:
+            added, removed = follows.follow(user, author_ids), 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Подписок добавлено: {added}, удалено: {removed}'
+            )
+        )
@@ -0,0 +1,285 @@
+import datetime
+import itertools
+import random
+import time
+
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+from posts import counters, timelines, transfer
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+IMAGE_SIZES = ((1920, 1080), (1280, 960), (1080, 1350), (800, 600))
+TEXT_POOL = 2000
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def zipf_weights(count, alpha):
+    """Веса рангов 1..count по закону Ципфа: 1 / rank ** alpha."""
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический набор данных: пользователей со степенным '
+        'распределением подписчиков, группы разного размера, посты с '
+        'картинками и комментарии'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--comments',
+            type=float,
+            default=3.0,
+            help='Среднее число комментариев к посту',
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0.3,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument(
+            '--image-files',
+            type=int,
+            default=20,
+            help='Сколько разных файлов картинок создать',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.2,
+            help=(
+                'Показатель степенного закона: чем больше, тем сильнее '
+                'подписчики и посты сосредоточены у немногих'
+            ),
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить посты',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--prefix',
+            default='gen',
+            help='Префикс имён пользователей и адресов групп',
+        )
+
+    def progress(self, name, count):
+        if self.verbosity > 1:
+            self.stdout.write(f'{name}: {count}')
+
+    def insert(self, name, model, objs):
+        # Счётчики пересчитываются один раз в конце.
+        options = {'update_counters': False} if model is Post else {}
+        count = 0
+        for batch in batched(objs, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **options)
+            count += len(batch)
+            self.progress(name, count)
+        return count
+
+    def create_users(self, options):
+        password = make_password(None)
+        return self.insert('users', User, (
+            User(
+                username=f'{self.prefix}_{n}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=f'{self.prefix}_{n}@example.com',
+                password=password,
+                date_joined=self.random_date(),
+            )
+            for n in range(options['users'])
+        ))
+
+    def create_groups(self, options):
+        return self.insert('groups', Group, (
+            Group(
+                title=f'{self.fake.word().capitalize()} {n}',
+                slug=f'{self.prefix}-{n}',
+                description=self.fake.sentence(),
+            )
+            for n in range(options['groups'])
+        ))
+
+    def create_images(self, options):
+        """Несколько JPEG разных размеров, общих для многих постов."""
+        images = []
+        for n in range(options['image_files'] if options['images'] else 0):
+            size = self.rng.choice(IMAGE_SIZES)
+            image = Image.new('RGB', size, tuple(
+                self.rng.randrange(256) for _ in range(3)
+            ))
+            draw = ImageDraw.Draw(image)
+            for _ in range(30):
+                x, y = (self.rng.randrange(s) for s in size)
+                draw.ellipse(
+                    (x, y, x + size[0] // 4, y + size[1] // 4),
+                    fill=tuple(self.rng.randrange(256) for _ in range(3)),
+                )
+            content = BytesIO()
+            image.save(content, format='JPEG', quality=85)
+            data = content.getvalue()
+            name = default_storage.save(
+                f'posts/{self.prefix}_{n}.jpg', ContentFile(data)
+            )
+            images.append((name, *size, len(data)))
+        return images
+
+    def random_date(self):
+        return self.now - datetime.timedelta(
+            seconds=self.rng.uniform(0, self.days * 24 * 60 * 60)
+        )
+
+    def pick(self, population, weights):
+        return self.rng.choices(population, cum_weights=weights)[0]
+
+    def posts(self, options, authors, groups, images):
+        # Посты пишут в основном популярные авторы, но мягче, чем на них
+        # подписываются; группы тоже различаются размером по Ципфу.
+        author_weights = zipf_weights(len(authors), options['alpha'] / 2)
+        group_weights = zipf_weights(len(groups), options['alpha'])
+        for _ in range(options['posts']):
+            post = Post(
+                text=self.rng.choice(self.texts),
+                author_id=self.pick(authors, author_weights),
+                pub_date=self.random_date(),
+            )
+            if groups and self.rng.random() < 0.6:
+                post.group_id = self.pick(groups, group_weights)
+            if images and self.rng.random() < options['images']:
+                name, width, height, size = self.rng.choice(images)
+                post.image = name
+                post.image_width, post.image_height = width, height
+                post.image_size = size
+            yield post
+
+    def follows(self, options, users):
+        # Популярность автора — ранг по Ципфу в случайном порядке
+        # пользователей, число подписок читателя — по Парето.
+        authors = users[:]
+        self.rng.shuffle(authors)
+        weights = zipf_weights(len(authors), options['alpha'])
+        for user in users:
+            count = min(
+                len(users) - 1, int(5 * self.rng.paretovariate(1.5))
+            )
+            followed = set(self.rng.choices(
+                authors, cum_weights=weights, k=count
+            ))
+            followed.discard(user)
+            for author in followed:
+                yield Follow(user_id=user, author_id=author)
+
+    def comments(self, options, users, first_post):
+        posts = (
+            Post.objects.filter(pk__gte=first_post)
+            .values_list('pk', 'pub_date')
+            .iterator(chunk_size=self.batch_size)
+        )
+        rate = 1 / options['comments'] if options['comments'] else None
+        for post, pub_date in posts:
+            count = int(self.rng.expovariate(rate)) if rate else 0
+            for _ in range(count):
+                yield Comment(
+                    text=self.rng.choice(self.sentences),
+                    author_id=self.rng.choice(users),
+                    post_id=post,
+                    created=min(self.now, pub_date + datetime.timedelta(
+                        seconds=self.rng.expovariate(1 / 86400)
+                    )),
+                )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1 or options['users'] < 2:
+            raise CommandError(
+                '--batch-size должен быть больше нуля, а --users — '
+                'хотя бы 2'
+            )
+        self.prefix = options['prefix']
+        users = User.objects.filter(username__startswith=f'{self.prefix}_')
+        if users.exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже есть: '
+                f'задайте другой --prefix'
+            )
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        # Faker медленный: тексты берутся из заранее созданного набора.
+        self.texts = [
+            self.fake.paragraph(nb_sentences=5) for _ in range(TEXT_POOL)
+        ]
+        self.sentences = [self.fake.sentence() for _ in range(TEXT_POOL)]
+        self.now = timezone.now()
+        self.days = options['days']
+        start = time.perf_counter()
+
+        created = {}
+        with transfer.keep_dates():
+            created['users'] = self.create_users(options)
+            users = list(users.order_by('pk').values_list('pk', flat=True))
+            created['groups'] = self.create_groups(options)
+            groups = list(
+                Group.objects.filter(slug__startswith=f'{self.prefix}-')
+                .values_list('pk', flat=True)
+            )
+            images = self.create_images(options)
+            first_post = (
+                Post.objects.order_by('-pk').values_list('pk', flat=True)
+                .first() or 0
+            ) + 1
+            created['posts'] = self.insert(
+                'posts', Post, self.posts(options, users, groups, images)
+            )
+            created['follows'] = self.insert(
+                'follows', Follow, self.follows(options, users)
+            )
+            created['comments'] = self.insert(
+                'comments', Comment, self.comments(options, users, first_post)
+            )
+
+        # bulk_create не вызывает сигналы: счётчики и ленты подписок
+        # пересчитываются по созданным данным.
+        with transaction.atomic():
+            Comment.objects.fill_paths()
+            counters.reconcile()
+        if timelines.strategy() != timelines.PULL:
+            call_command('rebuild_timelines', stdout=self.stdout)
+
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f'{name}: {n}' for name, n in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {summary}, картинок: {len(images)} за {elapsed:.2f} с'
+        ))
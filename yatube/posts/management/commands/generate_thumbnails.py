@@ -0,0 +1,53 @@
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие копии картинок всех постов (размеры и форматы '
+        'для srcset) параллельно'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков',
+        )
+
+    def process(self, post_id):
+        try:
+            return thumbnails.process(post_id), None
+        except Exception as e:
+            return False, f'post {post_id}: {e}'
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        post_ids = (
+            Post.objects.exclude(image='')
+            .values_list('pk', flat=True)
+            .iterator()
+        )
+        posts = updated = failed = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for changed, error in pool.map(self.process, post_ids):
+                posts += 1
+                updated += changed
+                if error:
+                    failed += 1
+                    self.stderr.write(error)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов с картинками: {posts}, обновлено: {updated}, '
+            f'ошибок: {failed}, за {elapsed:.2f} с'
+        ))
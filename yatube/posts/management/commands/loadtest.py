@@ -0,0 +1,247 @@
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model,
+)
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+VIEWS = ('index', 'group', 'profile', 'detail', 'follow')
+# Сколько первых страниц лент запрашивать.
+PAGES = 5
+PAGE_SIZE = 10
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу; values отсортированы."""
+    if not values:
+        return 0
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест лент: параллельные запросы к IndexView, '
+        'GroupView, ProfileView, PostDetailView и FollowIndexView через '
+        'тестовый клиент Django или по HTTP к запущенному серверу; '
+        'выводит p50/p95/p99 задержки и число запросов к БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help=(
+                'Адрес сервера, например http://127.0.0.1:8000 (gunicorn); '
+                'без него запросы идут через тестовый клиент в этом '
+                'процессе, и считаются запросы к БД'
+            ),
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Число параллельных клиентов',
+        )
+        parser.add_argument(
+            '--views',
+            nargs='+',
+            choices=VIEWS,
+            default=list(VIEWS),
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=50,
+            help='Сколько читателей с подписками заходят в /follow/',
+        )
+        parser.add_argument(
+            '--clear-cache',
+            action='store_true',
+            help='Очистить кеш перед тестом (только без --url)',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def pages(self, count):
+        return max(1, -(-count // PAGE_SIZE))
+
+    def random_post(self, bounds):
+        low, high = bounds
+        return (
+            Post.objects.filter(pk__gte=self.rng.randint(low, high))
+            .order_by('pk')
+            .values_list('pk', 'author__username')
+            .first()
+        )
+
+    def sessions(self, count):
+        """Сессии читателей с подписками, как после входа на сайт."""
+        engine = import_module(settings.SESSION_ENGINE)
+        readers = User.objects.filter(
+            pk__in=Follow.objects.values('user').distinct()[:count]
+        )
+        keys = []
+        for user in readers:
+            session = engine.SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            keys.append(session.session_key)
+        return keys
+
+    def plan(self, options):
+        """Список запросов: (вид, путь, ключ сессии или None)."""
+        bounds = Post.objects.order_by('pk').values_list('pk', flat=True)
+        if not bounds.exists():
+            raise CommandError(
+                'В базе нет постов: создайте их командой generate_dataset'
+            )
+        bounds = (bounds.first(), bounds.last())
+        index_pages = min(PAGES, self.pages(Post.objects.count()))
+        groups = list(
+            Group.objects.filter(posts_count__gt=0)
+            .order_by('-posts_count')
+            .values_list('slug', 'posts_count')[:100]
+        )
+        views = [
+            view for view in options['views'] if view != 'group' or groups
+        ]
+        sessions = []
+        if 'follow' in views:
+            sessions = self.sessions(options['readers'])
+            if not sessions:
+                views.remove('follow')
+        plan = []
+        for n in range(options['requests']):
+            view = views[n % len(views)]
+            page = 1
+            session = None
+            if view == 'index':
+                path = reverse('posts:index')
+                page = self.rng.randint(1, index_pages)
+            elif view == 'group':
+                slug, posts_count = self.rng.choice(groups)
+                path = reverse('posts:group_list', args=[slug])
+                page = self.rng.randint(
+                    1, min(PAGES, self.pages(posts_count))
+                )
+            elif view == 'follow':
+                path = reverse('posts:follow_index')
+                session = self.rng.choice(sessions)
+            else:
+                post, author = self.random_post(bounds)
+                path = (
+                    reverse('posts:post_detail', args=[post])
+                    if view == 'detail'
+                    else reverse('posts:profile', args=[author])
+                )
+            if page > 1:
+                path += f'?page={page}'
+            plan.append((view, path, session))
+        return plan
+
+    def client_request(self, clients, path, session):
+        client = clients.get(session)
+        if client is None:
+            client = clients[session] = Client()
+            if session:
+                client.cookies[settings.SESSION_COOKIE_NAME] = session
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - start
+        return elapsed, response.status_code, len(queries)
+
+    def http_request(self, base_url, path, session):
+        request = urllib.request.Request(base_url.rstrip('/') + path)
+        if session:
+            request.add_header(
+                'Cookie', f'{settings.SESSION_COOKIE_NAME}={session}'
+            )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+        except OSError:
+            status = 0
+        return time.perf_counter() - start, status, None
+
+    def worker(self, requests, base_url):
+        clients = {}
+        results = []
+        try:
+            for view, path, session in requests:
+                if base_url:
+                    result = self.http_request(base_url, path, session)
+                else:
+                    result = self.client_request(clients, path, session)
+                results.append((view, *result))
+        finally:
+            connections.close_all()
+        return results
+
+    def report(self, results, elapsed):
+        header = (
+            f'{"view":<8}{"requests":>9}{"errors":>8}{"p50 ms":>9}'
+            f'{"p95 ms":>9}{"p99 ms":>9}{"mean ms":>9}{"queries":>9}'
+        )
+        self.stdout.write(header)
+        for view in [*VIEWS, 'all']:
+            rows = [r for r in results if view in ('all', r[0])]
+            if not rows:
+                continue
+            times = sorted(r[1] * 1000 for r in rows)
+            errors = sum(1 for r in rows if not 200 <= r[2] < 400)
+            queries = [r[3] for r in rows if r[3] is not None]
+            self.stdout.write(
+                f'{view:<8}{len(rows):>9}{errors:>8}'
+                f'{percentile(times, 50):>9.1f}{percentile(times, 95):>9.1f}'
+                f'{percentile(times, 99):>9.1f}{statistics.mean(times):>9.1f}'
+                + (
+                    f'{statistics.mean(queries):>9.1f}' if queries
+                    else f'{"-":>9}'
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} запросов за {elapsed:.2f} с, '
+            f'{len(results) / elapsed:.1f} запросов/с'
+        ))
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError(
+                '--requests и --concurrency должны быть больше нуля'
+            )
+        self.rng = random.Random(options['seed'])
+        plan = self.plan(options)
+        if options['clear_cache'] and not options['url']:
+            cache.clear()
+        concurrency = options['concurrency']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            chunks = pool.map(
+                lambda n: self.worker(plan[n::concurrency], options['url']),
+                range(concurrency),
+            )
+            results = [result for chunk in chunks for result in chunk]
+        self.report(results, time.perf_counter() - start)
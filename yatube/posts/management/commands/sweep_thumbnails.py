@@ -0,0 +1,132 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from posts import thumbnails
+from posts.models import Post
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из каталога копий картинок (media/cache) файлы, на которые '
+        'не ссылается ни один пост, и сообщает, сколько места освобождено'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=16,
+            help=(
+                'На сколько частей делить каталог: в памяти держатся имена '
+                'копий только одной части'
+            ),
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60 * 24,
+            help=(
+                'Не трогать файлы моложе стольких секунд: их копии могут '
+                'ещё создаваться'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, ничего не удаляя',
+        )
+
+    def shard(self, name, shards):
+        # Копии sorl лежат в cache/<2 hex>/<2 hex>/<hash>.<ext>.
+        parts = name[len(self.root):].split('/')
+        try:
+            return int(parts[0], 16) % shards if len(parts) > 1 else 0
+        except ValueError:
+            return 0
+
+    def referenced(self, shard, shards):
+        """Имена копий, на которые ссылаются посты, из одной части."""
+        rows = (
+            Post.objects.exclude(image_variants='')
+            .values_list('image_variants', flat=True)
+            .iterator(chunk_size=2000)
+        )
+        return {
+            name
+            for image_variants in rows
+            for name in thumbnails.variant_names(image_variants)
+            if self.shard(name, shards) == shard
+        }
+
+    def walk(self, path):
+        """Файлы каталога хранилища; каталоги читаются по одному."""
+        try:
+            directories, files = default.storage.listdir(path)
+        except FileNotFoundError:
+            return
+        for file in files:
+            yield f'{path}{file}'
+        for directory in directories:
+            yield from self.walk(f'{path}{directory}/')
+
+    def shard_files(self, shard, shards):
+        """Файлы одной части: корень каталога относится к первой."""
+        try:
+            directories, files = default.storage.listdir(self.root)
+        except FileNotFoundError:
+            return
+        if shard == 0:
+            for file in files:
+                yield f'{self.root}{file}'
+        for directory in sorted(directories):
+            path = f'{self.root}{directory}/'
+            if self.shard(path, shards) == shard:
+                yield from self.walk(path)
+
+    def sweep(self, names, referenced, options):
+        cutoff = timezone.now() - timezone.timedelta(
+            seconds=options['min_age']
+        )
+        for name in names:
+            self.scanned += 1
+            if name in referenced:
+                continue
+            try:
+                if default.storage.get_modified_time(name) > cutoff:
+                    continue
+                size = default.storage.size(name)
+            except OSError:
+                continue
+            self.orphans += 1
+            self.freed += size
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{name}: {filesizeformat(size)}')
+            if not options['dry_run']:
+                default.storage.delete(name)
+                default.kvstore.delete(
+                    ImageFile(name, default.storage), delete_thumbnails=False
+                )
+
+    def handle(self, *args, **options):
+        self.root = sorl_settings.THUMBNAIL_PREFIX.rstrip('/') + '/'
+        shards = max(1, options['shards'])
+        self.scanned = self.orphans = self.freed = 0
+        start = time.perf_counter()
+        for shard in range(shards):
+            self.sweep(
+                self.shard_files(shard, shards),
+                self.referenced(shard, shards),
+                options,
+            )
+        elapsed = time.perf_counter() - start
+        verb = 'можно освободить' if options['dry_run'] else 'освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {self.scanned}, лишних: {self.orphans}, '
+            f'{verb}: {filesizeformat(self.freed)} ({self.freed} байт) '
+            f'за {elapsed:.2f} с'
+        ))
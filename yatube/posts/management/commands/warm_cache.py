@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from posts.models import Group, Post
+from posts.paginators import CursorPaginator
+from posts.views import GroupView, IndexView
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет кеш страниц: первые страницы главной и самых '
+        'больших групп, как их видит гость'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=settings.PAGE_CACHE_INDEX_PAGES,
+            help='Сколько страниц ленты прогреть на главной и в группе',
+        )
+        parser.add_argument(
+            '--groups',
+            type=int,
+            default=10,
+            help='Сколько групп с наибольшим числом постов прогреть',
+        )
+
+    def feed_urls(self, url, queryset, per_page, pages):
+        """Адреса первых страниц ленты, как по ним переходит посетитель."""
+        paginator = CursorPaginator(queryset, per_page)
+        urls = [url]
+        cursor = paginator.cursor_page().next_cursor
+        while cursor and len(urls) < pages:
+            urls.append(f'{url}?cursor={cursor}')
+            cursor = paginator.cursor_page(cursor).next_cursor
+        return urls
+
+    def handle(self, *args, **options):
+        urls = self.feed_urls(
+            reverse('posts:index'),
+            Post.objects.all(),
+            IndexView.paginate_by,
+            options['pages'],
+        )
+        groups = Group.objects.order_by('-posts_count', 'pk')
+        for group in groups[:options['groups']]:
+            urls += self.feed_urls(
+                reverse('posts:group_list', kwargs={'slug': group.slug}),
+                group.posts.all(),
+                GroupView.paginate_by,
+                options['pages'],
+            )
+
+        client = Client()
+        failed = 0
+        start = time.perf_counter()
+        for url in urls:
+            response = client.get(url)
+            if response.status_code != 200:
+                failed += 1
+                self.stderr.write(f'{url}: {response.status_code}')
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{url}: {response["X-Page-Cache"]}')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето страниц: {len(urls) - failed} из {len(urls)} '
+            f'за {elapsed:.2f} с'
+        ))
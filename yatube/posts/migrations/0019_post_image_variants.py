@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_auto_20261018_0522'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='JSON со списком копий картинки (см. posts.thumbnails)', verbose_name='Копии картинки'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def fill_image_dimensions(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = (
+        Post.objects.exclude(image='')
+        .values_list('pk', 'image')
+        .iterator()
+    )
+    for pk, name in posts:
+        try:
+            with default_storage.open(name) as file:
+                width, height = get_image_dimensions(file)
+            size = default_storage.size(name)
+        except OSError:
+            continue
+        Post.objects.filter(pk=pk).update(
+            image_width=width, image_height=height, image_size=size
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Размер картинки, байт'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(
+            fill_image_dimensions, migrations.RunPython.noop
+        ),
+    ]
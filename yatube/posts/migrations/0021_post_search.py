@@ -0,0 +1,116 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:45
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Поисковый индекс ведёт сама база (см. posts.search): на PostgreSQL —
+# триггер, заполняющий search_vector, и GIN-индекс по нему, на SQLite —
+# таблица FTS5 с триггерами. Миграции SQLite, пересоздающие posts_post,
+# удаляют и её триггеры: после них нужно снова выполнить SQLITE_TRIGGERS.
+POSTGRESQL_FORWARD = [
+    '''
+    CREATE FUNCTION posts_post_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector(
+            '{config}'::regconfig, coalesce(NEW.text, '')
+        );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER posts_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text ON posts_post
+    FOR EACH ROW EXECUTE PROCEDURE posts_post_search_vector_update()
+    ''',
+    '''
+    UPDATE posts_post
+    SET search_vector = to_tsvector('{config}'::regconfig, text)
+    ''',
+    '''
+    CREATE INDEX post_search_idx ON posts_post USING gin (search_vector)
+    ''',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS post_search_idx',
+    'DROP TRIGGER IF EXISTS posts_post_search_vector_trigger ON posts_post',
+    'DROP FUNCTION IF EXISTS posts_post_search_vector_update()',
+]
+SQLITE_TRIGGERS = [
+    '''
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);
+    END
+    ''',
+]
+SQLITE_FORWARD = [
+    '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    *SQLITE_TRIGGERS,
+    "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+STATEMENTS = {
+    'postgresql': (POSTGRESQL_FORWARD, POSTGRESQL_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def run(schema_editor, forward):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for sql in statements[0 if forward else 1]:
+        schema_editor.execute(
+            sql.replace('{config}', settings.SEARCH_CONFIG), params=None
+        )
+
+
+def create_search_index(apps, schema_editor):
+    run(schema_editor, forward=True)
+
+
+def drop_search_index(apps, schema_editor):
+    run(schema_editor, forward=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_auto_20261018_0540'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
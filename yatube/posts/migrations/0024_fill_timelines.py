@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:02
+
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_timelines(apps, schema_editor):
+    # Ленты появились в 0016 пустыми; заполняем их по уже существующим
+    # подпискам так же, как команда rebuild_timelines.
+    strategy = settings.FOLLOW_FEED_STRATEGY
+    if strategy == 'pull':
+        return
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    popular = UserStats.objects.none().values('user')
+    if strategy == 'hybrid':
+        popular = UserStats.objects.filter(
+            followers_count__gte=settings.TIMELINE_FANOUT_THRESHOLD
+        ).values('user')
+    readers = Follow.objects.order_by().values_list('user', flat=True)
+    for user_id in readers.distinct().iterator():
+        followed = Follow.objects.filter(user_id=user_id).values('author')
+        posts = (
+            Post.objects.filter(author__in=followed)
+            .exclude(author__in=popular)
+            .order_by('-pub_date')
+            .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+        )
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for pk, pub_date in posts
+            ),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_comment_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
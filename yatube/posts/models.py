@@ -1,11 +1,66 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from pytils.translit import slugify
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from . import slugs
 
 User = get_user_model()
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: всё, что нужно post_article.html, одним запросом."""
+        return (
+            self.select_related('author', 'group')
+            .only(
+                'text',
+                'pub_date',
+                'image',
+                'image_width',
+                'image_height',
+                'image_variants',
+                'author',
+                'author__username',
+                'author__first_name',
+                'author__last_name',
+                'group',
+                'group__slug',
+                'group__title',
+                'comments_count',
+            )
+        )
+
+    def bulk_create(self, objs, *args, update_counters=True, **kwargs):
+        """bulk_create, учитывающий посты в счётчиках авторов и групп.
+
+        update_counters=False отключает это для массовой загрузки, после
+        которой счётчики всё равно пересчитываются (counters.reconcile).
+        """
+        from .counters import posts_created
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if update_counters:
+                posts_created(objs)
+        return objs
+
+
+class CountersMixin:
+    """Сохраняет запись вместе с обновлением счётчиков в одной транзакции.
+
+    Счётчики обновляются в обработчиках сигналов (posts.signals), а они
+    вызываются внутри save(); удаление и так выполняется в транзакции.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Post(CountersMixin, models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текст нового поста',
@@ -30,13 +85,94 @@ class Post(models.Model):
         verbose_name='Имя группы',
     )
     image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Высота картинки',
+    )
+    image_size = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Размер картинки, байт',
+    )
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Копии картинки',
+        help_text='JSON со списком копий картинки (см. posts.thumbnails)',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    # Заполняется триггером PostgreSQL; GIN-индекс по нему создаёт
+    # миграция 0021, так как на SQLite его нет (см. posts.search).
+    search_vector = SearchVectorField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Под сортировку лент (pub_date, pk) в posts.paginators: главная,
+        # страница группы и профиль автора.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Размеры новой картинки берутся из загруженного файла, чтобы потом
+        # не открывать его ради вёрстки.
+        if not self.image:
+            self.image_width = self.image_height = self.image_size = None
+        elif not self.image._committed:
+            self.image_width = self.image.width
+            self.image_height = self.image.height
+            self.image_size = self.image.size
+        super().save(*args, **kwargs)
+
+
+class GroupQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """bulk_create, заполняющий пустые slug одним запросом (posts.slugs).
+
+        Если адрес успел занять параллельный запрос, адреса пачки
+        выбираются заново.
+        """
+        objs = list(objs)
+        empty = [obj for obj in objs if not obj.slug]
+        for attempt in range(slugs.ATTEMPTS):
+            slugs.assign(self, empty)
+            try:
+                with transaction.atomic(using=self.db):
+                    return super().bulk_create(objs, *args, **kwargs)
+            except IntegrityError:
+                if not empty or attempt == slugs.ATTEMPTS - 1:
+                    raise
+                for obj in empty:
+                    obj.slug = None
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -53,37 +189,116 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание группы',
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+    )
+
+    objects = GroupQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
-    @property
-    def slug_count(self):
-        return (
-            Group.objects.filter(slug__startswith=self.slug)
-            .exclude(pk=self.pk)
-            .count()
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using')
+        queryset = Group.objects.using(using)
+        for attempt in range(slugs.ATTEMPTS):
+            slugs.assign(queryset, [self])
+            try:
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Адрес мог занять параллельный запрос: выбираем заново.
+                if attempt == slugs.ATTEMPTS - 1:
+                    raise
+                self.slug = None
+
+
+class CommentQuerySet(models.QuerySet):
+    def roots(self, replies_limit):
+        """Корни веток с replies_cutoff — path первого ответа сверх лимита.
+
+        replies_cutoff пуст, если ответов в ветке не больше replies_limit.
+        Считается по индексу (thread, path) без чтения остальных ответов.
+        """
+        hidden = (
+            Comment.objects.filter(thread=OuterRef('pk'), depth__gt=0)
+            .order_by('path')
+            .values('path')[replies_limit:replies_limit + 1]
         )
+        return self.filter(depth=0).annotate(replies_cutoff=Subquery(hidden))
 
-    def save(self, *args, **kwargs):
-        def slug_dubls(slug_count):
-            self.slug += '-' + str(slug_count + 1)
-            slug_count = self.slug_count
-            if slug_count:
-                slug_dubls(slug_count)
+    def with_replies(self, roots):
+        """Комментарии roots (см. roots()) с первыми ответами одним запросом.
 
-            return
+        Ветки идут в порядке roots, внутри ветки — в порядке path, то есть
+        каждый ответ сразу после своего родителя. У последнего показанного
+        комментария ветки, где ответов больше, more_replies = True.
+        """
+        order = {root.pk: position for position, root in enumerate(roots)}
+        if not order:
+            return []
+        condition = Q()
+        for root in roots:
+            if root.replies_cutoff is None:
+                condition |= Q(thread=root.pk)
+            else:
+                condition |= Q(thread=root.pk, path__lt=root.replies_cutoff)
+        comments = sorted(
+            self.filter(condition)
+            .select_related('author')
+            .order_by('thread', 'path'),
+            key=lambda comment: order[comment.thread_id],
+        )
+        truncated = {
+            root.pk for root in roots if root.replies_cutoff is not None
+        }
+        for comment, following in zip(comments, comments[1:] + [None]):
+            if comment.thread_id in truncated and (
+                following is None or following.thread_id != comment.thread_id
+            ):
+                comment.more_replies = True
+        return comments
 
-        if not self.slug:
-            self.slug = slugify(self.title)[:100]
-            slug_count = self.slug_count
-            if slug_count:
-                slug_dubls(slug_count)
+    def fill_paths(self):
+        """Заполняет path, depth и thread после bulk_create.
+
+        Сначала корневые комментарии, затем по уровню за запрос ответы,
+        родители которых уже заполнены. Возвращает число записей.
+        """
+        segment = LPad(
+            Cast('pk', models.CharField()), Comment.PATH_STEP, Value('0')
+        )
+        updated = self.filter(path='', parent__isnull=True).update(
+            path=segment, depth=0, thread=F('pk')
+        )
+        parents = Comment.objects.filter(pk=OuterRef('parent_id'))
+        while True:
+            count = self.filter(path='', parent__path__gt='').update(
+                path=Concat(
+                    Subquery(parents.values('path')[:1]),
+                    segment,
+                    output_field=models.CharField(),
+                ),
+                depth=Subquery(
+                    parents.annotate(next_depth=F('depth') + 1)
+                    .values('next_depth')[:1]
+                ),
+                thread=Subquery(parents.values('thread')[:1]),
+            )
+            if not count:
+                return updated
+            updated += count
 
-        super().save(*args, **kwargs)
 
+class Comment(CountersMixin, models.Model):
+    # Путь — номера предков и самого комментария по PATH_STEP цифр:
+    # сортировка по нему даёт дерево ветки в порядке обхода.
+    PATH_STEP = 10
 
-class Comment(models.Model):
     text = models.TextField(
         verbose_name='Текст комментария',
         help_text='Текст комментария',
@@ -104,9 +319,86 @@ class Comment(models.Model):
         related_name='comments',
         verbose_name='Пост',
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+        verbose_name='Ответ на',
+    )
+    thread = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        editable=False,
+        related_name='+',
+        verbose_name='Ветка',
+    )
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Путь в ветке',
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Уровень',
+    )
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'depth', '-created', '-id'],
+                name='comment_thread_page_idx',
+            ),
+            models.Index(
+                fields=['thread', 'path'], name='comment_thread_path_idx'
+            ),
+        ]
 
+    def attach(self):
+        """Уровень и ветка нового ответа; возвращает начало его пути.
 
-class Follow(models.Model):
+        Ответ глубже COMMENT_MAX_DEPTH становится ответом на предка на
+        предельном уровне, номер которого берётся из пути родителя.
+        """
+        parent = self.parent
+        if parent is None:
+            return ''
+        max_depth = settings.COMMENT_MAX_DEPTH
+        if max_depth < 1:
+            self.parent = None
+            return ''
+        if parent.depth >= max_depth:
+            start = (max_depth - 1) * self.PATH_STEP
+            self.parent_id = int(parent.path[start:start + self.PATH_STEP])
+            prefix = parent.path[:start + self.PATH_STEP]
+        else:
+            prefix = parent.path
+        self.depth = len(prefix) // self.PATH_STEP
+        self.thread_id = parent.thread_id
+        return prefix
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            super().save(*args, **kwargs)
+            return
+        prefix = self.attach()
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            self.path = prefix + str(self.pk).zfill(self.PATH_STEP)
+            self.thread_id = self.thread_id or self.pk
+            Comment.objects.filter(pk=self.pk).update(
+                path=self.path, thread=self.thread_id
+            )
+
+
+class Follow(CountersMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -126,3 +418,60 @@ class Follow(models.Model):
                 fields=['author', 'user'], name='unique follow'
             )
         ]
+        # Подписки читателя: «подписан ли на автора» в профиле и список
+        # авторов для ленты /follow/.
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            )
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique timeline entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'], name='timeline_user_date_idx'
+            )
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя (см. posts.counters)."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Число постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Число подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Число подписок'
+    )
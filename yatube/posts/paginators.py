@@ -0,0 +1,200 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Сохраняет микросекунды, которые DjangoJSONEncoder отбрасывает."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (keyset) вместо OFFSET.
+
+    Страница выбирается условием по полям сортировки относительно
+    последней показанной записи, поэтому стоимость запроса не зависит от
+    глубины страницы и не требует COUNT(*). Методы обычного Paginator
+    (page, count, num_pages) остаются рабочими для старых ссылок ?page=N.
+    """
+
+    def __init__(
+        self, object_list, per_page, ordering=('-pub_date', '-pk'), **kwargs
+    ):
+        self.ordering = tuple(ordering)
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+
+    @cached_property
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _model_field(self, name):
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def encode_cursor(self, obj, direction=NEXT):
+        values = [getattr(obj, name) for name in self.fields]
+        raw = json.dumps([direction] + values, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            direction, *values = json.loads(raw.decode())
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            if len(values) != len(self.fields):
+                raise ValueError(values)
+            values = [
+                self._model_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (
+            binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+            ValidationError,
+        ):
+            raise InvalidCursor('Некорректный курсор')
+        return direction, values
+
+    def _after(self, values, reverse=False):
+        """Условие «строго после values» в порядке self.ordering."""
+        condition = Q()
+        for index in reversed(range(len(self.fields))):
+            descending = self.ordering[index].startswith('-') != reverse
+            lookup = '__lt' if descending else '__gt'
+            step = Q(**{self.fields[index] + lookup: values[index]})
+            if index < len(self.fields) - 1:
+                step |= Q(**{self.fields[index]: values[index]}) & condition
+            condition = step
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def _slice(self, queryset, direction, values):
+        """До per_page + 1 записей queryset за курсором в порядке обхода."""
+        if direction == PREVIOUS:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        if values is not None:
+            queryset = queryset.filter(
+                self._after(values, reverse=direction == PREVIOUS)
+            )
+        return list(queryset[:self.per_page + 1])
+
+    def _fetch(self, direction, values):
+        return self._slice(self.object_list, direction, values)
+
+    def cursor_page(self, cursor=None):
+        """Возвращает страницу, следующую за курсором (или первую)."""
+        direction, values = (
+            self.decode_cursor(cursor) if cursor else (NEXT, None)
+        )
+        object_list = self._fetch(direction, values)
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if direction == PREVIOUS:
+            object_list.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        page = self._get_page(object_list, None, self)
+        page.next_cursor = (
+            self.encode_cursor(object_list[-1], NEXT)
+            if has_next and object_list
+            else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(object_list[0], PREVIOUS)
+            if has_previous and object_list
+            else None
+        )
+        return page
+
+    @cached_property
+    def approximate_count(self):
+        """Оценка числа записей без полного COUNT(*), где это возможно.
+
+        На PostgreSQL берётся оценка планировщика из EXPLAIN, на остальных
+        СУБД используется обычный count — его вид кеширует сам (см.
+        CursorPaginationMixin.get_approximate_count).
+        """
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return self.count
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPaginationMixin:
+    """Подключает CursorPaginator к ListView.
+
+    Ссылки вида ?page=N продолжают работать через OFFSET, все остальные
+    запросы, включая первую страницу, обслуживаются по курсору ?cursor=.
+    """
+
+    paginator_class = CursorPaginator
+    cursor_kwarg = 'cursor'
+    cursor_ordering = ('-pub_date', '-pk')
+    show_approximate_count = False
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, ordering=self.cursor_ordering, **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.cursor_page(
+                self.request.GET.get(self.cursor_kwarg)
+            )
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        is_paginated = bool(page.next_cursor or page.previous_cursor)
+        return (paginator, page, page.object_list, is_paginated)
+
+    def get_approximate_count(self, paginator):
+        return paginator.approximate_count
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor'] = self.request.GET.get(self.cursor_kwarg, '')
+        if self.show_approximate_count and context['paginator']:
+            context['approximate_count'] = self.get_approximate_count(
+                context['paginator']
+            )
+        return context
@@ -0,0 +1,111 @@
+"""Полнотекстовый поиск по постам и группам.
+
+На PostgreSQL посты ищутся по столбцу Post.search_vector (tsvector с
+GIN-индексом), который заполняет триггер базы при каждой вставке и
+изменении текста; слова приводятся к основе по словарю SEARCH_CONFIG
+(russian), а результаты сортируются по ts_rank. На SQLite, где
+запускаются тесты и локальная разработка, тот же поиск идёт по
+виртуальной таблице FTS5 posts_post_fts, которую тоже ведут триггеры;
+словарей там нет, поэтому у слова отрезается русское окончание и оно
+ищется как префикс, а сортировка — по bm25. Таблицы и триггеры создаёт
+миграция 0021.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connections
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+# Грубая замена стеммера для FTS5: окончание отрезается, если остаётся
+# хотя бы три буквы.
+ENDING = re.compile(
+    r'(?<=\w{3})(ами|ями|ого|его|ому|ему|ых|их|ов|ев|ей|ий|ый|ой|ая|яя|'
+    r'ое|ее|ые|ие|ую|юю|ах|ях|ам|ям|ом|ем|[аеиоуыьюяй])$'
+)
+
+
+def words(query):
+    return WORD.findall(query.lower())
+
+
+def fts_query(query):
+    """Запрос FTS5 из слов поиска: спецсимволы FTS5 не попадают в него."""
+    return ' '.join(
+        f'"{ENDING.sub("", word)}"*' for word in words(query)
+    )
+
+
+def is_postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def posts(query, queryset=None):
+    """Посты, найденные по запросу, с релевантностью rank (больше — выше).
+
+    Сортировка не задаётся: порядок выбирает вызывающий код.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    if not words(query):
+        return queryset.none().annotate(rank=Value(0.0, FloatField()))
+    if is_postgresql(queryset):
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        )
+    match = fts_query(query)
+    # pk__in=RawSQL(...) обернул бы подзапрос во вторые скобки и сделал
+    # его скалярным, поэтому условие задаётся через extra().
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match],
+    ).annotate(
+        # bm25 тем меньше, чем документ релевантнее.
+        rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = posts_post.id',
+            [match],
+            output_field=FloatField(),
+        )
+    )
+
+
+def groups(query, queryset=None):
+    """Группы, в названии или описании которых есть слова запроса.
+
+    Групп немного, поэтому их вектор считается на лету, без индекса.
+    """
+    if queryset is None:
+        queryset = Group.objects.all()
+    terms = words(query)
+    if not terms:
+        return queryset.none()
+    if is_postgresql(queryset):
+        vector = (
+            SearchVector('title', weight='A', config=settings.SEARCH_CONFIG)
+            + SearchVector(
+                'description', weight='B', config=settings.SEARCH_CONFIG
+            )
+        )
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG)
+        return queryset.annotate(
+            rank=SearchRank(vector, search_query)
+        ).filter(rank__gt=0).order_by('-rank', 'title')
+    # LIKE в SQLite не различает регистр только у латиницы.
+    found = [
+        pk for pk, title, description
+        in queryset.values_list('pk', 'title', 'description').iterator()
+        if all(term in f'{title} {description}'.lower() for term in terms)
+    ]
+    return queryset.filter(pk__in=found).order_by('title')
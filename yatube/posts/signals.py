@@ -0,0 +1,204 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import cache, counters, thumbnails, timelines
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля автора, которые видны на страницах его постов.
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def invalidate_post_pages(post, group_ids=(), created=False):
+    """Сбрасывает страницы, на которых виден пост.
+
+    Новый пост не меняет страниц главной по курсору ('index:deep'), правка
+    и удаление — меняют.
+    """
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    author = User.objects.filter(pk=post.author_id).values_list(
+        'username', flat=True
+    )
+    cache.invalidate(
+        'index',
+        *([] if created else ['index:deep']),
+        f'post:{post.pk}',
+        *(f'group:{slug}' for slug in slugs),
+        *(f'profile:{username}' for username in author),
+    )
+
+
+def invalidate_posts(posts, *tags):
+    """Сбрасывает все страницы, на которых видны посты из posts.
+
+    Так расходится смена имени автора или группы: они показаны на
+    странице каждого поста, в лентах групп и профилей и на всех
+    страницах главной, в том числе по курсору.
+    """
+    slugs = (
+        Group.objects.filter(posts__in=posts)
+        .values_list('slug', flat=True)
+        .distinct()
+    )
+    usernames = (
+        User.objects.filter(posts__in=posts)
+        .values_list('username', flat=True)
+        .distinct()
+    )
+    cache.invalidate(
+        'index',
+        'index:deep',
+        *tags,
+        *(f'post:{pk}' for pk in posts.values_list('pk', flat=True)),
+        *(f'group:{slug}' for slug in slugs),
+        *(f'profile:{username}' for username in usernames),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = None
+    instance._previous_image_variants = ''
+    if instance.pk and not raw:
+        (
+            instance._previous_group_id,
+            instance._previous_image,
+            instance._previous_image_variants,
+        ) = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image', 'image_variants')
+            .first()
+        ) or (None, None, '')
+    if not raw and instance.image.name != instance._previous_image:
+        # Копии прежней картинки больше не подходят.
+        instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+        timelines.fan_out(instance)
+    elif instance._previous_group_id != instance.group_id:
+        counters.change_group(instance._previous_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    if instance.image.name != instance._previous_image:
+        thumbnails.schedule(instance)
+        thumbnails.schedule_remove(
+            instance._previous_image, instance._previous_image_variants
+        )
+    invalidate_post_pages(
+        instance, [instance._previous_group_id], created=created
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.decrease_user(instance.author_id, posts_count=1)
+    counters.change_group(instance.group_id, -1)
+    thumbnails.schedule_remove(instance.image.name, instance.image_variants)
+    invalidate_post_pages(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+        invalidate_post_pages(instance.post)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        invalidate_post_pages(post)
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        instance._previous_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    slugs = {instance.slug, instance._previous_slug} - {None}
+    tags = [f'group:{slug}' for slug in slugs]
+    if created:
+        cache.invalidate('index', *tags)
+    else:
+        invalidate_posts(instance.posts.all(), *tags)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы, по которой их найти.
+    invalidate_posts(instance.posts.all(), f'group:{instance.slug}')
+
+
+@receiver(pre_save, sender=User)
+def author_changing(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    instance._previous_names = None
+    if raw or not instance.pk:
+        return
+    if update_fields is None or set(update_fields) & set(AUTHOR_FIELDS):
+        instance._previous_names = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*AUTHOR_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login: страницы не меняются.
+    if raw or update_fields == frozenset({'last_login'}):
+        return
+    previous = instance._previous_names
+    names = tuple(getattr(instance, field) for field in AUTHOR_FIELDS)
+    if previous is None or previous == names:
+        cache.invalidate('index', f'profile:{instance.username}')
+        return
+    invalidate_posts(
+        instance.posts.all(),
+        f'profile:{instance.username}',
+        f'profile:{previous[0]}',
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        timelines.backfill(instance.user_id, [instance.author_id])
+        timelines.followers_changed([instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.decrease_user(instance.author_id, followers_count=1)
+    counters.decrease_user(instance.user_id, following_count=1)
+    timelines.remove_authors(instance.user_id, [instance.author_id])
+    timelines.followers_changed([instance.author_id], -1)
@@ -0,0 +1,92 @@
+"""Уникальные адреса групп: title -> slug, slug-2, slug-3, ...
+
+Занятые адреса для всех заголовков выбираются одним запросом: сам адрес
+и его варианты с номером, которые отбирает регулярное выражение в БД
+(начало адреса stem сужает выборку по индексу); следующий номер
+считается в Python. Два процесса всё же
+могут выбрать один адрес одновременно: это ловит уникальный индекс, и
+вызывающий код (Group.save, GroupQuerySet.bulk_create) повторяет попытку.
+"""
+import re
+
+from django.db.models import Q
+from pytils.translit import slugify
+
+ATTEMPTS = 5
+DEFAULT = 'group'
+# Сколько символов адреса оставить под суффикс вида -12345.
+SUFFIX_RESERVE = 6
+SUFFIX = re.compile(r'-([0-9]+)$')
+
+
+def base(title, max_length):
+    return slugify(title)[:max_length].strip('-') or DEFAULT
+
+
+def stem(slug, max_length):
+    """Общее начало адреса и всех его вариантов с номером."""
+    return slug[:max_length - SUFFIX_RESERVE]
+
+
+def numbered(slug, number, max_length):
+    suffix = f'-{number}'
+    return slug[:max_length - len(suffix)] + suffix
+
+
+def variants(slug, max_length):
+    """Регулярное выражение для slug-N при любом усечении под суффикс."""
+    prefixes = {
+        slug[:max_length - len('-') - digits]
+        for digits in range(1, SUFFIX_RESERVE)
+    }
+    return rf'^({"|".join(map(re.escape, sorted(prefixes)))})-[0-9]+$'
+
+
+def taken(queryset, slugs, max_length):
+    """Занятые адреса, которые могут совпасть с вариантами slugs."""
+    query = Q()
+    for slug in set(slugs):
+        query |= Q(slug=slug) | Q(
+            slug__startswith=stem(slug, max_length),
+            slug__regex=variants(slug, max_length),
+        )
+    if not query:
+        return set()
+    return set(queryset.filter(query).values_list('slug', flat=True))
+
+
+def allocate(slug, used, max_length):
+    """Свободный вариант slug; он сразу добавляется в used."""
+    if slug not in used:
+        used.add(slug)
+        return slug
+    numbers = [
+        int(match.group(1))
+        for match in map(SUFFIX.search, used)
+        if match
+    ]
+    number = max(
+        (
+            n for n in numbers
+            if numbered(slug, n, max_length) in used
+        ),
+        default=1,
+    ) + 1
+    slug = numbered(slug, number, max_length)
+    used.add(slug)
+    return slug
+
+
+def assign(queryset, objs):
+    """Заполняет пустые slug у objs одним запросом к БД."""
+    objs = [obj for obj in objs if not obj.slug]
+    if not objs:
+        return
+    max_length = queryset.model._meta.get_field('slug').max_length
+    bases = [base(obj.title, max_length) for obj in objs]
+    saved = [obj.pk for obj in objs if obj.pk]
+    if saved:
+        queryset = queryset.exclude(pk__in=saved)
+    used = taken(queryset, bases, max_length)
+    for obj, slug in zip(objs, bases):
+        obj.slug = allocate(slug, used, max_length)
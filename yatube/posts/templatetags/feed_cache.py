@@ -0,0 +1,49 @@
+from django import template
+from posts import cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, tags, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.tags = tags
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        tags = self.tags.resolve(context) or []
+        if isinstance(tags, str):
+            tags = [tags]
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return cache.fragment(
+            self.fragment_name,
+            list(tags),
+            vary_on,
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """Кеширует фрагмент ленты с версией по тегам (см. posts.cache).
+
+    {% feedcache [теги] [имя фрагмента] [var1] [var2] ... %}
+        ...
+    {% endfeedcache %}
+
+    Теги — строка или список строк, например page_cache_tags из контекста.
+    """
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+    )
@@ -0,0 +1,41 @@
+from django import template
+from posts import thumbnails
+
+register = template.Library()
+
+# Ширина картинки в колонке ленты; на узких экранах — во всю ширину.
+SIZES = '(min-width: 992px) 960px, 100vw'
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """<picture> с копиями картинки поста или заглушка, пока их нет.
+
+    Если копий нет (например, пост создан в обход сигналов), они ставятся
+    в очередь на создание.
+    """
+    variants = thumbnails.variants(post)
+    if variants is None:
+        if post.image:
+            thumbnails.schedule(post)
+        return {'image': post.image}
+    sources = variants['sources']
+    fallback = sources[thumbnails.FALLBACK_FORMAT]
+    # Для <img src> — копия ближайшей к ширине колонки ленты.
+    width, name = min(fallback, key=lambda source: abs(source[0] - 960))
+    return {
+        'image': post.image,
+        'sources': [
+            {
+                'type': thumbnails.MIME_TYPES[format_],
+                'srcset': thumbnails.srcset(format_sources),
+            }
+            for format_, format_sources in sources.items()
+            if format_ != thumbnails.FALLBACK_FORMAT
+        ],
+        'src': thumbnails.url(name),
+        'srcset': thumbnails.srcset(fallback),
+        'sizes': SIZES,
+        'width': width,
+        'height': round(width * thumbnails.ASPECT),
+    }
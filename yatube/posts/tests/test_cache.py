@@ -0,0 +1,263 @@
+import time
+
+from io import StringIO
+from unittest import mock
+
+from core.cache import LOCK_SUFFIX
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import (
+    FRAGMENT_KEY, _versioned_hash, fragment, invalidate, tag_versions,
+)
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test group',
+            slug='test-slug',
+            description='test description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other group',
+            slug='other-slug',
+            description='other description',
+        )
+        cls.post = Post.objects.create(
+            text='Первый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get(self, url):
+        return self.guest_client.get(url)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный запрос гостя отдаётся из кеша без запросов к БД."""
+
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': PageCacheTests.post.pk},
+            ),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)['X-Page-Cache'], 'miss')
+                with self.assertNumQueries(0):
+                    response = self.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'hit')
+                self.assertContains(response, 'Первый пост')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованный пользователь всегда получает свежую страницу."""
+
+        client = Client()
+        client.force_login(PageCacheTests.author)
+        client.get(reverse('posts:index'))
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_new_post_invalidates_affected_pages(self):
+        """Новый пост сбрасывает только страницы, где он виден."""
+
+        index = reverse('posts:index')
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        group = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        other_group = reverse(
+            'posts:group_list', kwargs={'slug': 'other-slug'}
+        )
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': PageCacheTests.post.pk}
+        )
+        for url in (index, profile, group, other_group, detail):
+            self.get(url)
+
+        Post.objects.create(
+            text='Второй пост',
+            author=PageCacheTests.author,
+            group=PageCacheTests.group,
+        )
+        self.assertContains(self.get(index), 'Второй пост')
+        self.assertContains(self.get(profile), 'Второй пост')
+        self.assertContains(self.get(group), 'Второй пост')
+        self.assertEqual(self.get(other_group)['X-Page-Cache'], 'hit')
+        self.assertEqual(self.get(detail)['X-Page-Cache'], 'hit')
+
+    def test_names_invalidate_post_pages(self):
+        """Новое имя автора и название группы видны на странице поста."""
+
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': PageCacheTests.post.pk}
+        )
+        self.get(detail)
+        author = User.objects.get(pk=PageCacheTests.author.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        self.assertContains(self.get(detail), 'Новое Имя')
+
+        self.assertEqual(self.get(detail)['X-Page-Cache'], 'hit')
+        group = Group.objects.get(pk=PageCacheTests.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.get(detail)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Новое название')
+
+        self.assertEqual(self.get(detail)['X-Page-Cache'], 'hit')
+        group.delete()
+        self.assertNotContains(self.get(detail), 'Новое название')
+
+    def test_login_keeps_post_pages(self):
+        """Вход автора и правка других полей не сбрасывают страницы постов."""
+
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': PageCacheTests.post.pk}
+        )
+        self.get(detail)
+        author = User.objects.get(pk=PageCacheTests.author.pk)
+        author.email = 'author@example.com'
+        author.save()
+        self.client.force_login(author)
+        self.assertEqual(self.get(detail)['X-Page-Cache'], 'hit')
+
+    def test_comment_invalidates_post_page(self):
+        """Новый комментарий сбрасывает страницу поста."""
+
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': PageCacheTests.post.pk}
+        )
+        self.get(detail)
+        Comment.objects.create(
+            text='Свежий комментарий',
+            author=PageCacheTests.author,
+            post=PageCacheTests.post,
+        )
+        self.assertContains(self.get(detail), 'Свежий комментарий')
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+    def render(self):
+        self.renders += 1
+        return f'render {self.renders}'
+
+    def test_fragment_follows_tag_version(self):
+        """Фрагмент живёт, пока не изменится версия его тега."""
+
+        self.assertEqual(fragment('feed', ['index'], [1], self.render),
+                         'render 1')
+        self.assertEqual(fragment('feed', ['index'], [1], self.render),
+                         'render 1')
+        invalidate('index')
+        self.assertEqual(fragment('feed', ['index'], [1], self.render),
+                         'render 2')
+
+    def test_tag_versions_do_not_expire(self):
+        """Версия тега переживает время жизни записей кеша по умолчанию."""
+
+        version = tag_versions(['index'])
+        later = time.time() + settings.CACHES['default']['TIMEOUT'] + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(tag_versions(['index']), version)
+
+    def test_invalidate_after_commit(self):
+        """После коммита версия тега повышается ещё раз."""
+
+        with mock.patch('posts.cache.transaction.on_commit') as on_commit:
+            version, = tag_versions(['index'])
+            invalidate('index')
+            self.assertEqual(tag_versions(['index']), [version + 1])
+            on_commit.call_args[0][0]()
+        self.assertEqual(tag_versions(['index']), [version + 2])
+
+    @override_settings(FRAGMENT_CACHE_REFRESH=-1)
+    def test_expired_fragment_is_served_during_refresh(self):
+        """Просроченный фрагмент пересчитывает тот, кто взял блокировку."""
+
+        fragment('feed', [], [1], self.render)
+        key = FRAGMENT_KEY.format('feed', _versioned_hash([1], []))
+        cache.add(key + LOCK_SUFFIX, 1)
+        self.assertEqual(fragment('feed', [], [1], self.render), 'render 1')
+        cache.delete(key + LOCK_SUFFIX)
+        self.assertEqual(fragment('feed', [], [1], self.render), 'render 2')
+
+
+class WarmCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test group',
+            slug='test-slug',
+            description='test description',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {n}', author=cls.author, group=cls.group)
+            for n in range(15)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_warm_cache(self):
+        """После прогрева первые страницы отдаются из кеша."""
+
+        out = StringIO()
+        call_command('warm_cache', pages=2, groups=1, stdout=out)
+        self.assertIn('Прогрето страниц: 4 из 4', out.getvalue())
+
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        for url in (index, group):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'hit')
+                next_page = response.content.decode().split('?cursor=')[1]
+                cursor = next_page.split('"')[0]
+                response = self.guest_client.get(f'{url}?cursor={cursor}')
+                self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_cursor_pages_follow_edits(self):
+        """Правка поста видна и на страницах главной по курсору."""
+
+        index = reverse('posts:index')
+        response = self.guest_client.get(index)
+        cursor = response.content.decode().split('?cursor=')[1].split('"')[0]
+        url = f'{index}?cursor={cursor}'
+        response = self.guest_client.get(url)
+        post = response.context['posts'][0]
+        self.assertEqual(self.guest_client.get(url)['X-Page-Cache'], 'hit')
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertContains(self.guest_client.get(url), 'Исправленный пост')
+        Post.objects.create(text='Новый пост', author=WarmCacheTests.author)
+        self.assertEqual(self.guest_client.get(url)['X-Page-Cache'], 'hit')
+        author = User.objects.get(pk=post.author_id)
+        author.first_name = 'Переименованный'
+        author.save()
+        self.assertContains(self.guest_client.get(url), 'Переименованный')
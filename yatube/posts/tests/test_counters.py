@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test group',
+            slug='test-slug',
+            description='test description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other group',
+            slug='other-slug',
+            description='other description',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+
+        post = Post.objects.create(
+            text='Пост', author=CountersTests.author, group=CountersTests.group
+        )
+        Post.objects.bulk_create(
+            Post(text='Пост', author=CountersTests.author) for _ in range(3)
+        )
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 4)
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 1)
+
+        post.group = CountersTests.other_group
+        post.save()
+        CountersTests.group.refresh_from_db()
+        CountersTests.other_group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 0)
+        self.assertEqual(CountersTests.other_group.posts_count, 1)
+
+        post.delete()
+        CountersTests.other_group.refresh_from_db()
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 3)
+        self.assertEqual(CountersTests.other_group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки меняют счётчики."""
+
+        post = Post.objects.create(text='Пост', author=CountersTests.author)
+        comment = Comment.objects.create(
+            text='Комментарий', author=CountersTests.reader, post=post
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+        follow = Follow.objects.create(
+            user=CountersTests.reader, author=CountersTests.author
+        )
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 1)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 0)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 0)
+
+    def test_reconcile_command(self):
+        """reconcile_counters исправляет разошедшиеся счётчики."""
+
+        post = Post.objects.create(
+            text='Пост', author=CountersTests.author, group=CountersTests.group
+        )
+        Comment.objects.create(
+            text='Комментарий', author=CountersTests.reader, post=post
+        )
+        UserStats.objects.filter(user=CountersTests.author).update(
+            posts_count=10
+        )
+        Group.objects.update(posts_count=5)
+        Post.objects.update(comments_count=0)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('users: исправлено 1', out.getvalue())
+        post.refresh_from_db()
+        CountersTests.group.refresh_from_db()
+        CountersTests.other_group.refresh_from_db()
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 1)
+        self.assertEqual(CountersTests.group.posts_count, 1)
+        self.assertEqual(CountersTests.other_group.posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,167 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters, follows
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+AUTHORS = 5
+
+
+class FollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(AUTHORS)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text='Пост', author=author)
+        cls.author_ids = [author.pk for author in cls.authors]
+
+    def setUp(self):
+        self.client.force_login(FollowsTests.reader)
+
+    def followed(self):
+        return set(
+            Follow.objects.filter(user=FollowsTests.reader).values_list(
+                'author_id', flat=True
+            )
+        )
+
+    def check_counters(self):
+        self.assertEqual(counters.reconcile()['users'], 0)
+
+    def test_follow_many(self):
+        """follow подписывает на всех авторов сразу и учитывает счётчики."""
+
+        created = follows.follow(
+            FollowsTests.reader,
+            FollowsTests.author_ids + [FollowsTests.reader.pk],
+        )
+        self.assertEqual(created, AUTHORS)
+        self.assertEqual(self.followed(), set(FollowsTests.author_ids))
+        self.assertEqual(
+            counters.for_user(FollowsTests.reader).following_count, AUTHORS
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=FollowsTests.reader).count(),
+            AUTHORS,
+        )
+        self.check_counters()
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка ничего не меняет."""
+
+        follows.follow(FollowsTests.reader, FollowsTests.author_ids[:2])
+        created = follows.follow(
+            FollowsTests.reader, FollowsTests.author_ids
+        )
+        self.assertEqual(created, AUTHORS - 2)
+        self.assertEqual(follows.follow(FollowsTests.reader, []), 0)
+        self.check_counters()
+
+    def test_queries_do_not_depend_on_count(self):
+        """Число запросов не зависит от числа авторов."""
+
+        # Первая подписка ещё и создаёт счётчики читателя.
+        follows.follow(FollowsTests.reader, FollowsTests.author_ids[:1])
+        counts = []
+        for author_ids in (
+            FollowsTests.author_ids[1:2], FollowsTests.author_ids[2:]
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                follows.follow(FollowsTests.reader, author_ids)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unfollow_many(self):
+        """unfollow удаляет подписки, записи ленты и меняет счётчики."""
+
+        follows.follow(FollowsTests.reader, FollowsTests.author_ids)
+        deleted = follows.unfollow(
+            FollowsTests.reader, FollowsTests.author_ids[:3]
+        )
+        self.assertEqual(deleted, 3)
+        self.assertEqual(self.followed(), set(FollowsTests.author_ids[3:]))
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                user=FollowsTests.reader,
+                post__author_id__in=FollowsTests.author_ids[:3],
+            ).exists()
+        )
+        self.assertEqual(
+            follows.unfollow(FollowsTests.reader, FollowsTests.author_ids[:3]),
+            0,
+        )
+        self.check_counters()
+
+    def test_sync(self):
+        """sync оставляет подписки ровно на переданных авторов."""
+
+        follows.follow(FollowsTests.reader, FollowsTests.author_ids[:3])
+        result = follows.sync(FollowsTests.reader, FollowsTests.author_ids[2:])
+        self.assertEqual(result, (AUTHORS - 3, 2))
+        self.assertEqual(self.followed(), set(FollowsTests.author_ids[2:]))
+        self.check_counters()
+
+    def test_follow_views_post(self):
+        """Подписка и отписка формой POST."""
+
+        author = FollowsTests.authors[0]
+        profile = reverse('posts:profile', args=[author.username])
+        response = self.client.post(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertRedirects(response, profile)
+        self.assertEqual(self.followed(), {author.pk})
+        response = self.client.get(profile)
+        self.assertContains(
+            response,
+            reverse('posts:profile_unfollow', args=[author.username]),
+        )
+        response = self.client.post(
+            reverse('posts:profile_unfollow', args=[author.username])
+        )
+        self.assertRedirects(response, profile)
+        self.assertEqual(self.followed(), set())
+        self.check_counters()
+
+    def test_follow_unknown_author(self):
+        """Подписка на несуществующего автора — 404."""
+
+        response = self.client.post(
+            reverse('posts:profile_follow', args=['nobody'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_command(self):
+        """follow_authors подписывает, отписывает и сверяет подписки."""
+
+        usernames = [author.username for author in FollowsTests.authors]
+        out = StringIO()
+        call_command(
+            'follow_authors', 'reader', *usernames, 'nobody', stdout=out,
+            stderr=StringIO(),
+        )
+        self.assertIn(f'добавлено: {AUTHORS}', out.getvalue())
+        call_command(
+            'follow_authors', 'reader', *usernames[:2], unfollow=True,
+            stdout=StringIO(),
+        )
+        self.assertEqual(self.followed(), set(FollowsTests.author_ids[2:]))
+        call_command(
+            'follow_authors', 'reader', *usernames[:1], sync=True,
+            stdout=StringIO(),
+        )
+        self.assertEqual(self.followed(), {FollowsTests.author_ids[0]})
+        self.check_counters()
@@ -1,12 +1,16 @@
 import shutil
 import tempfile
 
+from io import BytesIO
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -127,6 +131,62 @@ class FormTests(TestCase):
             ).exists()
         )
 
+    def upload(self, size, format_='JPEG', name='photo.jpg'):
+        content = BytesIO()
+        Image.new('RGB', size, (10, 120, 200)).save(content, format=format_)
+        return SimpleUploadedFile(
+            name=name,
+            content=content.getvalue(),
+            content_type=Image.MIME[format_],
+        )
+
+    def post_form(self, image):
+        return PostForm(data={'text': 'Картинка'}, files={'image': image})
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_large_image_is_downscaled(self):
+        """Большая картинка уменьшается, её размеры сохраняются в посте"""
+
+        form = self.post_form(self.upload((400, 200)))
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = FormTests.user
+        post = form.save()
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        self.assertEqual(post.image_size, post.image.size)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_small_image_is_kept(self):
+        """Картинка в пределах ограничений сохраняется как есть"""
+
+        upload = self.upload((300, 200), 'PNG', 'small.png')
+        size = upload.size
+        form = self.post_form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = FormTests.user
+        post = form.save()
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        self.assertEqual(post.image_size, size)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_file_too_large(self):
+        """Слишком большой файл отклоняется"""
+
+        form = self.post_form(self.upload((300, 200)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10_000)
+    def test_too_many_pixels(self):
+        """Картинка со слишком большим разрешением отклоняется"""
+
+        form = self.post_form(self.upload((300, 200)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
     def test_comment_post(self):
         """Комментарий авторизованного пользователя создается правильно"""
 
@@ -0,0 +1,107 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса или сортировка во временной
+# структуре вместо чтения по индексу.
+SQLITE_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+$')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+POSTGRES_SCAN = re.compile(r'Seq Scan on posts_\w+')
+POSTGRES_SORT = re.compile(r'Sort Key')
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN ' + sql)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц постов читают таблицы posts_* по индексам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test group',
+            slug='test-slug',
+            description='test description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(15)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            text='Комментарий', author=cls.user, post=cls.post
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(QueryPlanTests.user)
+
+    def assert_indexed(self, url, allow_sort=False):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        if connection.vendor == 'sqlite':
+            bad_plans = [SQLITE_SCAN] + ([] if allow_sort else [SQLITE_SORT])
+        else:
+            bad_plans = [POSTGRES_SCAN] + (
+                [] if allow_sort else [POSTGRES_SORT]
+            )
+        for query in queries:
+            sql = query['sql']
+            if 'posts_' not in sql or not sql.startswith('SELECT'):
+                continue
+            plan = query_plan(sql)
+            for line in plan:
+                for bad_plan in bad_plans:
+                    with self.subTest(url=url, sql=sql):
+                        self.assertIsNone(
+                            bad_plan.search(line), '\n'.join(plan)
+                        )
+        return response
+
+    def test_hot_queries_use_indexes(self):
+        """Ленты, профиль, пост и подписки не сканируют таблицы целиком."""
+
+        first_page = self.assert_indexed(reverse('posts:index'))
+        cursor = first_page.context['page_obj'].next_cursor
+        urls = [
+            reverse('posts:index') + f'?cursor={cursor}',
+            reverse(
+                'posts:group_list', kwargs={'slug': QueryPlanTests.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': QueryPlanTests.author.username},
+            ),
+            reverse(
+                'posts:post_detail', kwargs={'post_id': QueryPlanTests.post.pk}
+            ),
+        ]
+        for url in urls:
+            self.assert_indexed(url)
+
+        # Лента подписок сортирует уже отобранные по индексам посты:
+        # ленту читателя (не длиннее TIMELINE_LENGTH) и посты популярных
+        # авторов, поэтому сортировка здесь допустима, а полный проход — нет.
+        self.assert_indexed(reverse('posts:follow_index'), allow_sort=True)
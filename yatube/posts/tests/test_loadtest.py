@@ -0,0 +1,89 @@
+import shutil
+import statistics
+import tempfile
+
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TransactionTestCase, override_settings
+
+from .. import counters
+from ..management.commands.loadtest import percentile
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+# Копии картинок создаются сразу: фоновые потоки мешали бы потокам
+# loadtest в общей базе SQLite в памяти. Их запросы к KV-хранилищу sorl
+# повторяются по числу картинок, поэтому поиск N+1 выключен.
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False, NPLUSONE_THRESHOLD=0
+)
+class LoadTestTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, **options):
+        call_command(
+            'generate_dataset',
+            users=60,
+            groups=5,
+            posts=300,
+            comments=2,
+            images=0.2,
+            image_files=2,
+            stdout=StringIO(),
+            **options,
+        )
+
+    def test_generate_dataset(self):
+        """Набор данных создан, подписчики распределены неравномерно."""
+
+        self.generate()
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(Follow.objects.filter(
+            user=F('author')
+        ).exists())
+        followers = list(
+            UserStats.objects.values_list('followers_count', flat=True)
+        )
+        self.assertGreater(max(followers), 5 * statistics.median(followers))
+        self.assertEqual(
+            counters.reconcile(), {'users': 0, 'groups': 0, 'posts': 0}
+        )
+
+    def test_loadtest(self):
+        """Отчёт содержит процентили и число запросов к БД по видам."""
+
+        self.generate()
+        out = StringIO()
+        call_command(
+            'loadtest', requests=20, concurrency=1, readers=5, stdout=out
+        )
+        report = out.getvalue()
+        for column in ('p50 ms', 'p95 ms', 'p99 ms', 'queries'):
+            self.assertIn(column, report)
+        for view in ('index', 'group', 'profile', 'detail', 'follow'):
+            self.assertRegex(report, rf'\n{view} +4 +0 ')
+        self.assertIn('20 запросов', report)
+
+    def test_percentile(self):
+        """Процентиль считается по ближайшему рангу."""
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 95), 0)
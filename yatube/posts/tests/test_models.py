@@ -1,6 +1,11 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from .. import slugs
 from ..models import Group, Post
 
 User = get_user_model()
@@ -63,3 +68,83 @@ class PostModelTest(TestCase):
                 self.assertEquals(
                     post._meta.get_field(value).help_text, expected
                 )
+
+
+class GroupSlugTests(TestCase):
+    def create(self, title):
+        return Group.objects.create(title=title, description='Описание')
+
+    def selects(self, queries):
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+
+    def test_slug_from_title(self):
+        """Адрес создаётся из заголовка, повторы получают номер."""
+
+        created = [self.create('Новая группа').slug for _ in range(3)]
+        self.assertEqual(
+            created, ['novaya-gruppa', 'novaya-gruppa-2', 'novaya-gruppa-3']
+        )
+        self.assertEqual(self.create('Новая группа спорт').slug,
+                         'novaya-gruppa-sport')
+
+    def test_one_query(self):
+        """Свободный номер выбирается одним запросом."""
+
+        for _ in range(5):
+            self.create('Группа')
+        Group.objects.filter(slug='gruppa-3').delete()
+        with CaptureQueriesContext(connection) as queries:
+            group = self.create('Группа')
+        self.assertEqual(group.slug, 'gruppa-6')
+        self.assertEqual(len(self.selects(queries)), 1)
+
+    def test_only_variants_selected(self):
+        """Из БД выбираются только сам адрес и его варианты с номером."""
+
+        for title in ('Спорт', 'Спорт', 'Спорт и мы', 'Спортзал'):
+            self.create(title)
+        max_length = Group._meta.get_field('slug').max_length
+        self.assertEqual(
+            slugs.taken(Group.objects.all(), ['sport'], max_length),
+            {'sport', 'sport-2'},
+        )
+
+    def test_long_title(self):
+        """Номер помещается в длину поля за счёт конца адреса."""
+
+        title = 'очень длинное название группы ' * 5
+        first, second = self.create(title), self.create(title)
+        max_length = Group._meta.get_field('slug').max_length
+        self.assertEqual(len(first.slug), max_length)
+        self.assertEqual(len(second.slug), max_length)
+        self.assertTrue(second.slug.endswith('-2'))
+
+    def test_bulk_create(self):
+        """bulk_create заполняет адреса пачки одним запросом."""
+
+        self.create('Книги')
+        with CaptureQueriesContext(connection) as queries:
+            Group.objects.bulk_create([
+                Group(title=title, description='Описание')
+                for title in ('Книги', 'Книги', 'Фильмы', '!!!')
+            ])
+        self.assertEqual(len(self.selects(queries)), 1)
+        self.assertEqual(
+            set(Group.objects.values_list('slug', flat=True)),
+            {'knigi', 'knigi-2', 'knigi-3', 'filmyi', 'group'},
+        )
+
+    def test_retry_on_conflict(self):
+        """Если адрес заняли между выбором и записью, выбирается другой."""
+
+        self.create('Гонка')
+        # Первая попытка не видит занятый адрес, как при параллельной
+        # записи; уникальный индекс не даёт сохранить повтор.
+        with mock.patch.object(
+            slugs, 'taken', side_effect=[set(), {'gonka'}]
+        ):
+            group = self.create('Гонка')
+        self.assertEqual(group.slug, 'gonka-2')
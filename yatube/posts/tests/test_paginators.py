@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..paginators import CursorPaginator
+
+User = get_user_model()
+
+ALL_POSTS = 25
+PER_PAGE = 10
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user)
+            for i in range(ALL_POSTS)
+        )
+        # Часть постов с одинаковой датой: порядок держится на pk.
+        same_date = timezone.now() - timedelta(days=1)
+        Post.objects.filter(pk__lte=5).update(pub_date=same_date)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def test_walk_forward_and_back(self):
+        """Курсоры проходят все записи без пропусков и повторов."""
+
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        pages = [paginator.cursor_page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.cursor_page(pages[-1].next_cursor))
+        seen = [post.pk for page in pages for post in page]
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(pages[0].previous_cursor)
+
+        back = paginator.cursor_page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+        self.assertIsNotNone(back.next_cursor)
+
+    def test_invalid_cursor(self):
+        """Испорченный курсор даёт 404."""
+
+        response = Client().get(reverse('posts:index'), {'cursor': 'xyz'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_deep_page_has_no_count(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        cursor = paginator.cursor_page().next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.cursor_page(cursor)
+            self.assertEqual(len(page), PER_PAGE)
+
+    def test_views_use_cursor_links(self):
+        """Список отдаёт ссылки ?cursor= и поддерживает старые ?page=."""
+
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        response = Client().get(url)
+        page = response.context['page_obj']
+        self.assertTrue(response.context['is_paginated'])
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+
+        response = Client().get(url, {'cursor': page.next_cursor})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[PER_PAGE:PER_PAGE * 2],
+        )
+
+        response = Client().get(url, {'page': 3})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(
+            len(response.context['page_obj']), ALL_POSTS - PER_PAGE * 2
+        )
+
+    def test_index_count_cached(self):
+        """Итог главной считается один раз до появления нового поста."""
+
+        cache.clear()
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('posts:index')
+        self.assertEqual(
+            client.get(url).context['approximate_count'], ALL_POSTS
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.context['approximate_count'], ALL_POSTS)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ])
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = client.get(url)
+        self.assertEqual(
+            response.context['approximate_count'], ALL_POSTS + 1
+        )
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Котики',
+            slug='cats',
+            description='Всё о котах',
+        )
+        cls.post_cat = Post.objects.create(
+            text='Котики спят весь день', author=cls.user, group=cls.group
+        )
+        cls.post_cats = Post.objects.create(
+            text='Котики, котики и ещё раз котики', author=cls.user
+        )
+        cls.post_dog = Post.objects.create(
+            text='Собака гуляет', author=cls.user
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост про котиков номер {n}', author=cls.user)
+            for n in range(12)
+        )
+
+    def test_posts_are_ranked(self):
+        """Найдены только подходящие посты, лучший — первым."""
+
+        found = search.posts('котики').order_by('-rank')
+        self.assertEqual(found[0], SearchTests.post_cats)
+        self.assertIn(SearchTests.post_cat, found)
+        self.assertNotIn(SearchTests.post_dog, found)
+
+    def test_index_follows_changes(self):
+        """Изменение и удаление поста сразу видны в поиске."""
+
+        post = SearchTests.post_dog
+        post.text = 'Теперь здесь попугай'
+        post.save()
+        self.assertFalse(search.posts('собака').exists())
+        self.assertEqual(list(search.posts('попугай')), [post])
+        post.delete()
+        self.assertFalse(search.posts('попугай').exists())
+
+    def test_query_syntax_is_ignored(self):
+        """Спецсимволы запроса не ломают поиск."""
+
+        for query in ('"котики', 'котики OR *', 'NEAR(котики)', '-:^'):
+            with self.subTest(query=query):
+                list(search.posts(query))
+
+    def test_groups(self):
+        """Группы ищутся по названию и описанию без учёта регистра."""
+
+        self.assertEqual(list(search.groups('котики')), [SearchTests.group])
+        self.assertEqual(list(search.groups('КОТАХ')), [SearchTests.group])
+        self.assertFalse(search.groups('собака').exists())
+
+    def test_search_view(self):
+        """Страница поиска показывает группы и постранично посты."""
+
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'котики'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['groups']), [
+            SearchTests.group
+        ])
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA')
+
+        response = self.client.get(url, {'q': 'котики', 'page': 2})
+        self.assertEqual(len(response.context['posts']), 4)
+        self.assertNotIn('groups', response.context)
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+
+        response = self.client.get(reverse('posts:search'), {'q': '  '})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['posts'])
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по полнотекстовому индексу."""
+
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,251 @@
+import os
+import shutil
+import tempfile
+
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def small_gif(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+def photo(name='photo.jpg', size=(1000, 500)):
+    """JPEG с EXIF, как с камеры телефона."""
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    content = BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(
+        content, format='JPEG', exif=exif
+    )
+    return SimpleUploadedFile(
+        name=name, content=content.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create([
+            Post(text='Пост с картинкой', author=cls.user, image=photo())
+        ])
+        cls.post = Post.objects.get()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, post):
+        return Template(
+            '{% load post_images %}{% post_image post %}'
+        ).render(Context({'post': post}))
+
+    def test_variants(self):
+        """Копии создаются нужных ширин и форматов, без EXIF."""
+
+        sources = thumbnails.generate(ThumbnailTests.post.image)['sources']
+        self.assertEqual(list(sources)[-1], 'JPEG')
+        self.assertIn('WEBP', sources)
+        for format_, variants in sources.items():
+            with self.subTest(format=format_):
+                self.assertEqual([w for w, _ in variants], [480, 960])
+                for width, name in variants:
+                    with default_storage.open(name) as file:
+                        image = Image.open(file)
+                        self.assertEqual(image.format, format_)
+                        self.assertEqual(image.size, (width, round(
+                            width * thumbnails.ASPECT
+                        )))
+                        self.assertNotIn('exif', image.info)
+                        if format_ == 'JPEG':
+                            self.assertTrue(image.info.get('progressive'))
+
+    @override_settings(POST_IMAGE_FORMATS=('AVIF', 'WEBP'))
+    def test_small_image_and_fallback_format(self):
+        """Маленькая картинка даёт одну копию; JPEG создаётся всегда."""
+
+        post = Post.objects.create(
+            text='Маленькая', author=ThumbnailTests.user, image=small_gif()
+        )
+        sources = thumbnails.generate(post.image)['sources']
+        self.assertIn('JPEG', sources)
+        self.assertEqual([w for w, _ in sources['JPEG']], [480])
+
+    def test_placeholder_until_ready(self):
+        """Пока копий нет, показывается заглушка, потом — <picture>."""
+
+        post = ThumbnailTests.post
+        self.assertIn('img/placeholder.png', self.render(post))
+        self.assertTrue(thumbnails.process(post.pk))
+        post.refresh_from_db()
+        html = self.render(post)
+        self.assertNotIn('img/placeholder.png', html)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(' 480w, ', html)
+        self.assertIn('width="960" height="339"', html)
+        self.assertFalse(thumbnails.process(post.pk))
+
+    def test_post_without_image(self):
+        """Пост без картинки выводится без img."""
+
+        post = Post(text='Без картинки', author=ThumbnailTests.user)
+        self.assertNotIn('<img', self.render(post))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+
+    def tearDown(self):
+        thumbnails.wait()
+        super().tearDown()
+
+    @override_settings(THUMBNAIL_ASYNC=True)
+    def test_variants_are_generated_in_background(self):
+        """После сохранения поста копии создаёт пул потоков."""
+
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=small_gif()
+        )
+        thumbnails.wait(timeout=5)
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.variants(post))
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_new_image_replaces_variants(self):
+        """Замена картинки заменяет и её копии."""
+
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=small_gif()
+        )
+        post.refresh_from_db()
+        old_variants = post.image_variants
+        post.image = small_gif('other.gif')
+        post.save()
+        post.refresh_from_db()
+        self.assertTrue(post.image_variants)
+        self.assertNotEqual(post.image_variants, old_variants)
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_old_files_are_removed(self):
+        """Прежняя картинка и её копии удаляются при замене и удалении."""
+
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=small_gif()
+        )
+        post.refresh_from_db()
+        old_names = [post.image.name, *thumbnails.variant_names(
+            post.image_variants
+        )]
+        post.image = small_gif('other.gif')
+        post.save()
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name), name)
+        post.refresh_from_db()
+        new_names = [post.image.name, *thumbnails.variant_names(
+            post.image_variants
+        )]
+        for name in new_names:
+            self.assertTrue(default_storage.exists(name), name)
+        post.delete()
+        for name in new_names:
+            self.assertFalse(default_storage.exists(name), name)
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_shared_image_is_kept(self):
+        """Картинка, на которую ссылается другой пост, не удаляется."""
+
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=small_gif()
+        )
+        Post.objects.create(
+            text='Копия', author=self.user, image=post.image.name
+        )
+        post.delete()
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_sweep_thumbnails_command(self):
+        """Команда удаляет старые копии, на которые нет ссылок."""
+
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=small_gif()
+        )
+        post.refresh_from_db()
+        referenced = thumbnails.variant_names(post.image_variants)
+        orphan = default_storage.save('cache/ab/cd/orphan.jpg', small_gif())
+        fresh = default_storage.save('cache/ab/cd/fresh.jpg', small_gif())
+        old = os.path.getmtime(default_storage.path(orphan)) - 2 * 86400
+        os.utime(default_storage.path(orphan), (old, old))
+
+        out = StringIO()
+        call_command('sweep_thumbnails', dry_run=True, stdout=out)
+        self.assertIn('лишних: 1', out.getvalue())
+        self.assertTrue(default_storage.exists(orphan))
+
+        out = StringIO()
+        call_command('sweep_thumbnails', shards=3, stdout=out)
+        self.assertIn('лишних: 1, освобождено:', out.getvalue())
+        self.assertIn(f'({len(SMALL_GIF)} байт)', out.getvalue())
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(fresh))
+        for name in referenced:
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_generate_thumbnails_command(self):
+        """Команда создаёт копии для существующих постов."""
+
+        Post.objects.bulk_create(
+            Post(text=f'Пост {n}', author=self.user, image=small_gif())
+            for n in range(3)
+        )
+        out = StringIO()
+        # SQLite в памяти не даёт двум потокам писать одновременно.
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn(
+            'Постов с картинками: 3, обновлено: 3', out.getvalue()
+        )
+        for post in Post.objects.all():
+            self.assertIsNotNone(thumbnails.variants(post))
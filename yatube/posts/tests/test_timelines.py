@@ -0,0 +1,187 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author) for i in range(5)
+        )
+
+    def timeline(self):
+        return list(
+            TimelineEntry.objects.filter(user=TimelineTests.reader)
+            .order_by('-pub_date', '-post')
+            .values_list('post', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+
+        follow = Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        self.assertEqual(
+            self.timeline(),
+            list(
+                Post.objects.filter(author=TimelineTests.author)
+                .order_by('-pub_date', '-pk')
+                .values_list('pk', flat=True)
+            ),
+        )
+        follow.delete()
+        self.assertEqual(self.timeline(), [])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает только в ленты подписчиков автора."""
+
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        post = Post.objects.create(text='Новый', author=TimelineTests.author)
+        other_post = Post.objects.create(
+            text='Чужой', author=TimelineTests.other
+        )
+        self.assertIn(post.pk, self.timeline())
+        self.assertNotIn(other_post.pk, self.timeline())
+
+    @override_settings(TIMELINE_LENGTH=3, TIMELINE_TRIM_INTERVAL=1)
+    def test_timeline_is_trimmed(self):
+        """Лента обрезается до TIMELINE_LENGTH самых новых постов."""
+
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        self.assertEqual(len(self.timeline()), 3)
+        post = Post.objects.create(text='Новый', author=TimelineTests.author)
+        timeline = self.timeline()
+        self.assertEqual(len(timeline), 3)
+        self.assertEqual(timeline[0], post.pk)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает потерянные ленты."""
+
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        expected = self.timeline()
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(), expected)
+
+    @override_settings(
+        FOLLOW_FEED_STRATEGY='hybrid', TIMELINE_FANOUT_THRESHOLD=2
+    )
+    def test_hybrid_merges_popular_authors_on_read(self):
+        """Посты популярного автора не раздаются, но видны в ленте."""
+
+        Follow.objects.create(
+            user=TimelineTests.other, author=TimelineTests.author
+        )
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        post = Post.objects.create(text='Новый', author=TimelineTests.author)
+        self.assertNotIn(post.pk, self.timeline())
+
+        client = Client()
+        client.force_login(TimelineTests.reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertEqual(
+            len(response.context['page_obj']),
+            Post.objects.filter(author=TimelineTests.author).count(),
+        )
+
+    @override_settings(
+        FOLLOW_FEED_STRATEGY='hybrid', TIMELINE_FANOUT_THRESHOLD=2
+    )
+    def test_hybrid_pages(self):
+        """Ленту с постами популярного автора листают курсором и ?page=N."""
+
+        popular = User.objects.create_user(username='popular')
+        Follow.objects.create(user=TimelineTests.other, author=popular)
+        Follow.objects.create(user=TimelineTests.reader, author=popular)
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        for i in range(8):
+            Post.objects.create(text=f'Популярный {i}', author=popular)
+            Post.objects.create(
+                text=f'Обычный {i}', author=TimelineTests.author
+            )
+        expected = list(
+            Post.objects.filter(author__in=[popular, TimelineTests.author])
+            .order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+
+        client = Client()
+        client.force_login(TimelineTests.reader)
+        url = reverse('posts:follow_index')
+        pages, cursor = [], ''
+        while cursor is not None:
+            page = client.get(url, {'cursor': cursor}).context['page_obj']
+            pages.append([post.pk for post in page])
+            cursor = page.next_cursor
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(pages, []), expected)
+
+        page = client.get(
+            url, {'cursor': page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual([post.pk for post in page], pages[1])
+        page = client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual([post.pk for post in page], pages[1])
+
+    @override_settings(
+        FOLLOW_FEED_STRATEGY='hybrid', TIMELINE_FANOUT_THRESHOLD=2
+    )
+    def test_crossing_threshold_moves_posts(self):
+        """Автор, перешедший порог, уходит из лент и возвращается в них."""
+
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        self.assertEqual(len(self.timeline()), 5)
+        follow = Follow.objects.create(
+            user=TimelineTests.other, author=TimelineTests.author
+        )
+        self.assertEqual(self.timeline(), [])
+        post = Post.objects.create(text='Новый', author=TimelineTests.author)
+        follow.delete()
+        self.assertEqual(len(self.timeline()), 6)
+        self.assertEqual(self.timeline()[0], post.pk)
+
+    def test_benchmark_command(self):
+        """benchmark_feed сравнивает стратегии и ничего не оставляет."""
+
+        posts_before = Post.objects.count()
+        out = StringIO()
+        call_command(
+            'benchmark_feed',
+            readers=10,
+            authors=5,
+            popular=1,
+            posts_per_author=2,
+            publish=3,
+            sample=3,
+            stdout=out,
+        )
+        for name in ('push', 'pull', 'hybrid'):
+            self.assertIn(name, out.getvalue())
+        self.assertEqual(Post.objects.count(), posts_before)
@@ -0,0 +1,145 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PUB_DATE = datetime.datetime(
+    1854, 3, 14, 12, 30, 15, 123456, tzinfo=timezone.utc
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.export_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.export_dir, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='leo', first_name='Лев', password='pass'
+        )
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Дневники', slug='diaries', description='Записи'
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f'Запись {n}',
+                author=self.author,
+                group=self.group if n % 2 else None,
+                image=f'posts/picture_{n}.gif' if n == 0 else '',
+            )
+            for n in range(5)
+        ]
+        Post.objects.filter(pk=self.posts[0].pk).update(pub_date=PUB_DATE)
+        Comment.objects.create(
+            text='Хорошо', author=self.reader, post=self.posts[0]
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def snapshot(self):
+        return {
+            'users': list(User.objects.order_by('pk').values_list(
+                'pk', 'username', 'first_name', 'password'
+            )),
+            'groups': list(Group.objects.values_list(
+                'pk', 'slug', 'posts_count'
+            )),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'author', 'group', 'image',
+                'comments_count',
+            )),
+            'comments': list(Comment.objects.values_list(
+                'pk', 'text', 'created', 'author', 'post'
+            )),
+            'follows': list(Follow.objects.values_list(
+                'pk', 'user', 'author'
+            )),
+        }
+
+    def round_trip(self, path):
+        before = self.snapshot()
+        call_command('export_posts', path, stderr=StringIO())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertFalse(Post.objects.exists())
+        out = StringIO()
+        call_command('import_posts', path, batch_size=2, stdout=out)
+        self.assertIn(
+            'Загружено users: 2, groups: 1, posts: 5, comments: 1, '
+            'follows: 1',
+            out.getvalue(),
+        )
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).pub_date, PUB_DATE
+        )
+        self.assertEqual(
+            User.objects.get(username='leo').stats.followers_count, 1
+        )
+
+    def test_jsonl_round_trip(self):
+        """Выгрузка в JSON Lines и загрузка пачками сохраняют данные."""
+
+        self.round_trip(os.path.join(TransferTests.export_dir, 'data.jsonl'))
+
+    def test_csv_round_trip(self):
+        """Выгрузка в CSV и загрузка пачками сохраняют данные."""
+
+        self.round_trip(os.path.join(TransferTests.export_dir, 'csv'))
+
+    def test_repeated_import(self):
+        """Повторная загрузка того же набора ничего не дублирует."""
+
+        path = os.path.join(TransferTests.export_dir, 'again.jsonl')
+        call_command('export_posts', path, stderr=StringIO())
+        before = self.snapshot()
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_media_is_copied(self):
+        """Картинки загруженных постов копируются из --media-from."""
+
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, ignore_errors=True)
+        os.makedirs(os.path.join(source, 'posts'))
+        with open(os.path.join(source, 'posts', 'picture_0.gif'), 'wb') as f:
+            f.write(SMALL_GIF)
+        path = os.path.join(TransferTests.export_dir, 'media.jsonl')
+        call_command('export_posts', path, stderr=StringIO())
+        out = StringIO()
+        call_command(
+            'import_posts', path, media_from=source, workers=2, stdout=out
+        )
+        self.assertIn('Скопировано файлов: 1', out.getvalue())
+        self.assertTrue(default_storage.exists('posts/picture_0.gif'))
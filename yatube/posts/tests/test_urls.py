@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Group, Post
@@ -7,6 +7,7 @@ from ..models import Group, Post
 User = get_user_model()
 
 
+@override_settings(NPLUSONE_RAISE=True)
 class URLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -5,12 +5,14 @@ from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Comment, Group, Post
+from ..views import COMMENTS_PER_PAGE, REPLIES_PER_THREAD
 
 User = get_user_model()
 
@@ -30,7 +32,7 @@ SMALL_GIF = (
 )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, NPLUSONE_RAISE=True)
 class ViewTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -303,7 +305,7 @@ class ViewTests(TestCase):
         self.assertTrue(object.comments.filter(text='Тестовый комментарий 1'))
 
     def test_cache_index_contains(self):
-        """Кеширование главной страницы работает правильно"""
+        """Кеш главной страницы сбрасывается при изменении постов"""
 
         post_new = Post.objects.create(
             author=ViewTests.user,
@@ -311,21 +313,17 @@ class ViewTests(TestCase):
         )
 
         response = self.authorized_client.get(reverse('posts:index'))
-        objects = response.context['page_obj']
+        self.assertContains(response, 'Тест кэша')
         content_1 = response.content
 
-        post_new.delete()
-
         response = self.authorized_client.get(reverse('posts:index'))
         content_2 = response.content
         self.assertEqual(content_1, content_2)
 
-        key = make_template_fragment_key('index_page', [objects.number])
-        cache.delete(key)
+        post_new.delete()
 
         response = self.authorized_client.get(reverse('posts:index'))
-        content_3 = response.content
-        self.assertNotEqual(content_1, content_3)
+        self.assertNotContains(response, 'Тест кэша')
 
     def create_posts(self, author):
         posts = (
@@ -449,3 +447,342 @@ class ViewTests(TestCase):
         self.assertIn(post_1, objects)
         self.assertIn(post_2, objects)
         self.assertNotIn(post_3, objects)
+
+
+@override_settings(NPLUSONE_RAISE=True)
+class FeedQueriesTests(TestCase):
+    """Число запросов ленты не зависит от числа постов и авторов."""
+
+    # Сессия и пользователь, выборка постов и то, что нужно самой
+    # странице: примерный итог, группа, автор со счётчиками, подписка.
+    # Лента подписок отдельно читает посты популярных авторов.
+    QUERY_BUDGET = {
+        'posts:index': 4,
+        'posts:group_list': 4,
+        'posts:profile': 5,
+        'posts:follow_index': 4,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='feed group',
+            slug='feed-slug',
+            description='feed description',
+        )
+        for i in range(10):
+            author = User.objects.create_user(
+                username=f'author_{i}', first_name='Имя', last_name='Фамилия'
+            )
+            author.following.create(user=cls.user)
+            post = Post.objects.create(
+                text=f'Пост {i}', author=author, group=cls.group
+            )
+            Comment.objects.create(
+                text='Комментарий', author=author, post=post
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(FeedQueriesTests.user)
+
+    def test_feed_query_budget(self):
+        """Страница ленты укладывается в фиксированный бюджет запросов."""
+
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list',
+                kwargs={'slug': FeedQueriesTests.group.slug},
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': 'author_0'}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            with self.subTest(name=name):
+                with self.assertNumQueries(self.QUERY_BUDGET[name]):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_feed_comments_count(self):
+        """Лента аннотирует число комментариев к посту."""
+
+        response = self.client.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            self.assertEqual(post.comments_count, 1)
+
+    def test_post_detail_comments(self):
+        """Авторы комментариев загружаются вместе с комментариями."""
+
+        post = Post.objects.get(text='Пост 0')
+        for author in User.objects.filter(username__startswith='author_'):
+            Comment.objects.create(text='Ещё', author=author, post=post)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertEqual(len(response.context['comments_page']), 11)
+
+
+@override_settings(NPLUSONE_RAISE=True)
+class CommentPaginationTests(TestCase):
+    """Комментарии на странице поста выводятся страницами по курсору."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user
+        )
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {i}', author=cls.user, post=cls.post)
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+        Comment.objects.fill_paths()
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CommentPaginationTests.user)
+
+    def newest_first(self):
+        return list(
+            CommentPaginationTests.post.comments.order_by('-created', '-pk')
+        )
+
+    def test_first_page_and_load_more(self):
+        """Первая страница на странице поста, остальные — фрагментом."""
+
+        comments = self.newest_first()
+        response = self.client.get(CommentPaginationTests.detail_url)
+        page = response.context['comments_page']
+        self.assertEqual(list(page.object_list), comments[:COMMENTS_PER_PAGE])
+        self.assertContains(response, 'data-load-more')
+        next_url = (
+            reverse(
+                'posts:post_comments',
+                kwargs={'post_id': CommentPaginationTests.post.pk},
+            )
+            + f'?cursor={page.next_cursor}'
+        )
+        self.assertContains(response, next_url)
+
+        response = self.client.get(next_url)
+        self.assertEqual(
+            list(response.context['comments_page'].object_list),
+            comments[COMMENTS_PER_PAGE:],
+        )
+        self.assertNotContains(response, 'data-load-more')
+        self.assertNotContains(response, '<html')
+
+    def test_first_page_cached(self):
+        """Повторный показ поста не выбирает комментарии из БД."""
+
+        self.client.get(CommentPaginationTests.detail_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CommentPaginationTests.detail_url)
+        self.assertContains(response, 'Комментарий 24')
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'posts_comment' in query['sql']
+        ])
+
+    def test_new_comment_resets_cache(self):
+        """Новый комментарий сразу виден на странице поста."""
+
+        self.client.get(CommentPaginationTests.detail_url)
+        self.client.post(
+            reverse(
+                'posts:add_comment',
+                kwargs={'post_id': CommentPaginationTests.post.pk},
+            ),
+            data={'text': 'Свежий комментарий'},
+        )
+        response = self.client.get(CommentPaginationTests.detail_url)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор — 404."""
+
+        response = self.client.get(
+            reverse(
+                'posts:post_comments',
+                kwargs={'post_id': CommentPaginationTests.post.pk},
+            ),
+            {'cursor': 'broken'},
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadTests(TestCase):
+    """Ответы на комментарии выводятся ветками."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user
+        )
+        cls.other_post = Post.objects.create(
+            text='Другой пост', author=cls.user
+        )
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.add_url = reverse(
+            'posts:add_comment', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CommentThreadTests.user)
+
+    def thread(self, depth, post=None):
+        """Цепочка ответов глубины depth, возвращает последний."""
+        comment = None
+        for level in range(depth + 1):
+            comment = Comment.objects.create(
+                text=f'Уровень {level}',
+                author=CommentThreadTests.user,
+                post=post or CommentThreadTests.post,
+                parent=comment,
+            )
+        return comment
+
+    def test_reply(self):
+        """Ответ сохраняется в ветке родителя на уровень глубже."""
+
+        root = self.thread(0)
+        self.client.post(
+            CommentThreadTests.add_url,
+            data={'text': 'Ответ', 'parent': root.pk},
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, root)
+        self.assertEqual(reply.thread_id, root.pk)
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(root.path))
+
+    def test_reply_to_other_post(self):
+        """Ответ на комментарий другого поста — 404."""
+
+        foreign = self.thread(0, post=CommentThreadTests.other_post)
+        response = self.client.post(
+            CommentThreadTests.add_url,
+            data={'text': 'Ответ', 'parent': foreign.pk},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
+
+    def test_reply_form(self):
+        """?reply_to= показывает, на какой комментарий отвечают."""
+
+        root = self.thread(0)
+        response = self.client.get(
+            CommentThreadTests.detail_url, {'reply_to': root.pk}
+        )
+        self.assertEqual(response.context['reply_to'], root)
+        self.assertContains(
+            response, f'name="parent" value="{root.pk}"'
+        )
+
+    @override_settings(COMMENT_MAX_DEPTH=2)
+    def test_max_depth(self):
+        """Ответ глубже предела прикрепляется к предку на пределе."""
+
+        deepest = self.thread(2)
+        reply = Comment.objects.create(
+            text='Слишком глубоко',
+            author=CommentThreadTests.user,
+            post=CommentThreadTests.post,
+            parent=deepest,
+        )
+        self.assertEqual(reply.depth, 2)
+        self.assertEqual(reply.parent_id, deepest.parent_id)
+        self.assertEqual(reply.thread_id, deepest.thread_id)
+
+    def test_thread_order(self):
+        """Ответы идут сразу после родителя, ветки — от новых к старым."""
+
+        first = self.thread(0)
+        second = self.thread(0)
+        reply = Comment.objects.create(
+            text='Ответ первому',
+            author=CommentThreadTests.user,
+            post=CommentThreadTests.post,
+            parent=first,
+        )
+        response = self.client.get(CommentThreadTests.detail_url)
+        self.assertEqual(
+            response.context['comments_page'].comments,
+            [second, first, reply],
+        )
+
+    def test_long_thread_is_capped(self):
+        """Длинная ветка показывает первые ответы и ссылку на остальные."""
+
+        root = self.thread(0)
+        replies = [
+            Comment.objects.create(
+                text=f'Ответ {i}',
+                author=CommentThreadTests.user,
+                post=CommentThreadTests.post,
+                parent=root,
+            )
+            for i in range(REPLIES_PER_THREAD + 3)
+        ]
+        response = self.client.get(CommentThreadTests.detail_url)
+        comments = response.context['comments_page'].comments
+        self.assertEqual(comments, [root] + replies[:REPLIES_PER_THREAD])
+        self.assertContains(response, 'Показать ещё ответы')
+
+        response = self.client.get(
+            reverse(
+                'posts:post_comments',
+                kwargs={'post_id': CommentThreadTests.post.pk},
+            ),
+            {'thread': root.pk, 'cursor': comments[-1].replies_cursor},
+        )
+        self.assertEqual(
+            response.context['comments_page'].comments,
+            replies[REPLIES_PER_THREAD:],
+        )
+        self.assertNotContains(response, 'data-load-more')
+
+    def test_fill_paths(self):
+        """fill_paths заполняет ветки после bulk_create."""
+
+        root = self.thread(0)
+        Comment.objects.bulk_create([
+            Comment(
+                text='Ответ',
+                author=CommentThreadTests.user,
+                post=CommentThreadTests.post,
+                parent=root,
+            ),
+        ])
+        Comment.objects.fill_paths()
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.thread_id, root.pk)
+        self.assertEqual(reply.depth, 1)
+        self.assertEqual(reply.path, root.path + str(reply.pk).zfill(10))
+
+    def test_queries_do_not_depend_on_depth(self):
+        """Число запросов страницы поста не зависит от глубины веток."""
+
+        counts = []
+        for depth in (0, settings.COMMENT_MAX_DEPTH):
+            self.thread(depth)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(CommentThreadTests.detail_url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,242 @@
+"""Производные картинок постов.
+
+Картинки не обрабатываются при показе страницы: после сохранения поста
+его картинка отправляется в пул потоков (THUMBNAIL_WORKERS), который один
+раз создаёт кадрированные копии нескольких ширин (POST_IMAGE_WIDTHS) в
+каждом формате из POST_IMAGE_FORMATS, который поддерживает Pillow, без
+EXIF и с прогрессивным JPEG. Список копий сохраняется в
+Post.image_variants, и тег post_image выводит из него <picture> со srcset
+без обращений к хранилищу. Пока копий нет, показывается заглушка; как
+только они готовы, страницы поста сбрасываются из кеша.
+
+Когда пост удаляют или меняют ему картинку, прежняя картинка и её копии
+удаляются (remove), если на них больше не ссылается ни один пост. То, что
+осталось от старых версий, находит команда sweep_thumbnails.
+"""
+import json
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции кадра в лентах: 960x339.
+ASPECT = 339 / 960
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+FALLBACK_FORMAT = 'JPEG'
+
+_pending = set()
+_pending_lock = threading.Lock()
+_futures = set()
+
+
+def formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеют сохранять Pillow и sorl.
+
+    JPEG есть всегда: его получает <img> для старых браузеров.
+    """
+    Image.init()
+    supported = [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name in Image.SAVE and name in EXTENSIONS and name in MIME_TYPES
+    ]
+    if FALLBACK_FORMAT not in supported:
+        supported.append(FALLBACK_FORMAT)
+    return supported
+
+
+def widths(image, original_width=None):
+    """Ширины копий: не больше ширины оригинала, но хотя бы одна."""
+    if original_width is None:
+        with default.storage.open(getattr(image, 'name', image)) as file:
+            original_width, _ = get_image_dimensions(file)
+    fitting = [
+        width for width in sorted(settings.POST_IMAGE_WIDTHS)
+        if original_width and width <= original_width
+    ]
+    return fitting or [min(settings.POST_IMAGE_WIDTHS)]
+
+
+def generate(image, original_width=None):
+    """Создаёт копии картинки и возвращает их список для image_variants."""
+    sizes = widths(image, original_width)
+    sources = {}
+    for format_ in formats():
+        sources[format_] = []
+        for width in sizes:
+            thumbnail = get_thumbnail(
+                image,
+                f'{width}x{round(width * ASPECT)}',
+                crop='center',
+                upscale=True,
+                format=format_,
+                quality=settings.POST_IMAGE_QUALITY,
+                progressive=True,
+            )
+            sources[format_].append([width, thumbnail.name])
+    return {'sources': sources}
+
+
+def variants(post):
+    """Разобранный Post.image_variants или None, если копий ещё нет."""
+    if not post.image or not post.image_variants:
+        return None
+    return json.loads(post.image_variants)
+
+
+def url(name):
+    return default.storage.url(name)
+
+
+def variant_names(image_variants):
+    """Имена файлов всех копий из значения Post.image_variants."""
+    if not image_variants:
+        return []
+    return [
+        name
+        for sources in json.loads(image_variants)['sources'].values()
+        for _, name in sources
+    ]
+
+
+def delete_file(name):
+    """Удаляет файл из хранилища и возвращает, сколько байт освобождено."""
+    try:
+        size = default.storage.size(name)
+    except OSError:
+        return 0
+    default.storage.delete(name)
+    return size
+
+
+def remove(name, image_variants=''):
+    """Удаляет картинку, её копии и записи о них в KV-хранилище sorl.
+
+    Картинка, на которую ссылается другой пост, не трогается. Возвращает
+    число освобождённых байт.
+    """
+    if not name or Post.objects.filter(image=name).exists():
+        return 0
+    freed = sum(delete_file(variant) for variant in variant_names(
+        image_variants
+    ))
+    # Заодно удаляются копии, которых нет в image_variants: например,
+    # кадры, которые sorl создавал при показе страниц.
+    default.kvstore.delete(ImageFile(name, default.storage))
+    freed += delete_file(name)
+    logger.info('removed image %s, freed %s bytes', name, freed)
+    return freed
+
+
+def srcset(sources):
+    return ', '.join(f'{url(name)} {width}w' for width, name in sources)
+
+
+@lru_cache(maxsize=None)
+def executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.THUMBNAIL_WORKERS,
+        thread_name_prefix='thumbnails',
+    )
+
+
+def process(post_id):
+    """Создаёт копии картинки поста и сбрасывает его страницы из кеша.
+
+    Возвращает, изменился ли список копий.
+    """
+    from .signals import invalidate_post_pages
+
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'image_width', 'image_variants', 'author', 'group'
+    ).first()
+    if post is None or not post.image:
+        return False
+    image_variants = json.dumps(generate(post.image, post.image_width))
+    if image_variants == post.image_variants:
+        return False
+    # Картинку могли заменить, пока создавались копии старой.
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        image_variants=image_variants
+    )
+    if updated:
+        invalidate_post_pages(post)
+    return bool(updated)
+
+
+def _run(post_id):
+    try:
+        process(post_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(post_id)
+
+
+def _call(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('%s%r failed', func.__name__, args)
+
+
+def _work(func, *args):
+    # Поток пула держит своё соединение с БД: закрываем его после задачи.
+    try:
+        _call(func, *args)
+    finally:
+        connections.close_all()
+
+
+def _submit(func, *args):
+    if not settings.THUMBNAIL_ASYNC:
+        _call(func, *args)
+        return
+    future = executor().submit(_work, func, *args)
+    with _pending_lock:
+        _futures.add(future)
+    future.add_done_callback(_futures.discard)
+
+
+def schedule(post):
+    """Ставит создание копий картинки поста в очередь после коммита."""
+    if not post.image:
+        return
+    post_id = post.pk
+
+    def submit():
+        with _pending_lock:
+            if post_id in _pending:
+                return
+            _pending.add(post_id)
+        _submit(_run, post_id)
+
+    transaction.on_commit(submit)
+
+
+def schedule_remove(name, image_variants=''):
+    """Ставит удаление картинки и её копий в очередь после коммита."""
+    if name:
+        transaction.on_commit(lambda: _submit(remove, name, image_variants))
+
+
+def wait(timeout=None):
+    """Дожидается картинок, поставленных в очередь к этому моменту."""
+    with _pending_lock:
+        futures = list(_futures)
+    wait_futures(futures, timeout)
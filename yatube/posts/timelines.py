@@ -0,0 +1,299 @@
+"""Ленты подписок.
+
+Стратегия задаётся FOLLOW_FEED_STRATEGY:
+
+* push — fan-out on write: для каждого читателя хранятся ссылки на последние
+  посты авторов, на которых он подписан, и /follow/ читает одну
+  индексированную выборку по (user, pub_date);
+* pull — fan-out on read: лента собирается соединением Follow и Post;
+* hybrid — посты обычных авторов раздаются по лентам, а авторы, у которых
+  подписчиков не меньше TIMELINE_FANOUT_THRESHOLD, подмешиваются при чтении
+  из их собственных последних постов. Когда автор переходит порог, его
+  посты убираются из лент или раздаются по ним (followers_changed).
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import NEXT, CursorPaginator
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+TRIM_CHUNK_SIZE = 100
+
+PUSH = 'push'
+PULL = 'pull'
+HYBRID = 'hybrid'
+
+
+def strategy():
+    return settings.FOLLOW_FEED_STRATEGY
+
+
+def popular_authors(author_ids):
+    """Авторы из author_ids, чьи посты не раздаются по лентам."""
+    if strategy() != HYBRID:
+        return UserStats.objects.none().values('user')
+    return UserStats.objects.filter(
+        user__in=author_ids,
+        followers_count__gte=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).values('user')
+
+
+def is_pushed(author_id):
+    if strategy() == PULL:
+        return False
+    return not popular_authors([author_id]).exists()
+
+
+def feed(user):
+    """Лента подписок пользователя для текущей стратегии.
+
+    В pull это посты авторов, в push и hybrid — записи TimelineEntry с
+    постами: они читаются по индексу (user, pub_date), а не по всем постам.
+    """
+    if strategy() == PULL:
+        return Post.objects.filter(author__following__user=user).for_feed()
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def popular_posts(user):
+    """Посты популярных авторов из подписок: в hybrid их нет в ленте."""
+    followed = Follow.objects.filter(user=user).values('author')
+    return Post.objects.filter(
+        author__in=popular_authors(followed)
+    ).for_feed()
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорные страницы ленты из TimelineEntry.
+
+    В hybrid к записям ленты подмешиваются посты популярных авторов:
+    из каждого источника берётся не больше страницы за курсором, и они
+    сливаются по (pub_date, post_id). На страницах — сами посты.
+    """
+
+    def __init__(self, object_list, per_page, popular=None, **kwargs):
+        self.popular = popular
+        super().__init__(
+            object_list, per_page, ordering=('-pub_date', '-post_id'),
+            **kwargs
+        )
+
+    def _popular(self):
+        return self.popular.annotate(post_id=F('pk')).order_by(
+            *self.ordering
+        )
+
+    def _merge(self, entries, posts, descending=True):
+        merged = {entry.post_id: entry for entry in entries}
+        for post in posts:
+            merged.setdefault(
+                post.pk, TimelineEntry(post=post, pub_date=post.pub_date)
+            )
+        return sorted(
+            merged.values(),
+            key=attrgetter('pub_date', 'post_id'),
+            reverse=descending,
+        )
+
+    def _fetch(self, direction, values):
+        entries = super()._fetch(direction, values)
+        if self.popular is None:
+            return entries
+        posts = self._slice(self._popular(), direction, values)
+        return self._merge(entries, posts, descending=direction == NEXT)[
+            :self.per_page + 1
+        ]
+
+    @cached_property
+    def count(self):
+        count = super().count
+        if self.popular is not None:
+            count += self.popular.count()
+        return count
+
+    def page(self, number):
+        if self.popular is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        merged = self._merge(self.object_list[:top], self._popular()[:top])
+        return self._get_page(merged[bottom:top], number, self)
+
+    def _get_page(self, object_list, *args, **kwargs):
+        return super()._get_page(
+            [entry.post for entry in object_list], *args, **kwargs
+        )
+
+
+def paginator(user, per_page, **kwargs):
+    """Паджинатор ленты подписок пользователя для текущей стратегии."""
+    if strategy() == PULL:
+        return CursorPaginator(feed(user), per_page, **kwargs)
+    return FeedPaginator(
+        feed(user),
+        per_page,
+        popular=popular_posts(user) if strategy() == HYBRID else None,
+        **kwargs,
+    )
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей не больше TIMELINE_LENGTH записей.
+
+    Граница (дата самой старой оставляемой записи) считается одним запросом
+    для всех пользователей, затем всё, что старше неё, удаляется пачками.
+    """
+    length = settings.TIMELINE_LENGTH
+    oldest_kept = (
+        TimelineEntry.objects.filter(user=OuterRef('pk'))
+        .order_by('-pub_date')
+        .values('pub_date')[length - 1:length]
+    )
+    cutoffs = (
+        User.objects.filter(pk__in=user_ids)
+        .annotate(cutoff=Subquery(oldest_kept))
+        .filter(cutoff__isnull=False)
+        .values_list('pk', 'cutoff')
+    )
+    cutoffs = list(cutoffs)
+    for start in range(0, len(cutoffs), TRIM_CHUNK_SIZE):
+        condition = Q()
+        for user_id, cutoff in cutoffs[start:start + TRIM_CHUNK_SIZE]:
+            condition |= Q(user_id=user_id, pub_date__lt=cutoff)
+        TimelineEntry.objects.filter(condition).delete()
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_pushed(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    if not follower_ids:
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    # Ленты обрезаются не на каждом посте, а раз в TIMELINE_TRIM_INTERVAL:
+    # между обрезками лента может быть длиннее на столько же записей.
+    if post.pk % settings.TIMELINE_TRIM_INTERVAL == 0:
+        trim(follower_ids)
+
+
+def _insert(user_id, posts, **kwargs):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.order_by('-pub_date').values_list(
+                'pk', 'pub_date'
+            )[:settings.TIMELINE_LENGTH]
+        ),
+        batch_size=BATCH_SIZE,
+        **kwargs,
+    )
+
+
+def backfill(user_id, author_ids):
+    """Заполняет ленту последними постами авторов после подписки."""
+    if strategy() == PULL:
+        return
+    _insert(
+        user_id,
+        Post.objects.filter(author_id__in=author_ids).exclude(
+            author__in=popular_authors(author_ids)
+        ),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def remove_authors(user_id, author_ids):
+    """Убирает из ленты посты авторов после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids
+    ).delete()
+
+
+def _push_author(author_id):
+    """Раздаёт последние посты автора по лентам всех его подписчиков."""
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    if not posts:
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    for start in range(0, len(follower_ids), TRIM_CHUNK_SIZE):
+        batch = follower_ids[start:start + TRIM_CHUNK_SIZE]
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for user_id in batch
+                for pk, pub_date in posts
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        trim(batch)
+
+
+def followers_changed(author_ids, delta):
+    """Учитывает переход авторов через TIMELINE_FANOUT_THRESHOLD в hybrid.
+
+    Вызывается после того, как followers_count авторов изменился на delta
+    (1 или -1). Автор, набравший порог, убирается из лент: его посты
+    теперь подмешиваются при чтении. Опустившийся ниже порога раздаётся
+    по лентам подписчиков — иначе пропали бы посты, написанные, пока он
+    был популярным.
+    """
+    if strategy() != HYBRID or not author_ids:
+        return
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    crossed = UserStats.objects.filter(
+        user__in=author_ids,
+        followers_count=threshold if delta > 0 else threshold - 1,
+    ).values_list('user_id', flat=True)
+    for author_id in list(crossed):
+        if delta > 0:
+            TimelineEntry.objects.filter(post__author_id=author_id).delete()
+        else:
+            _push_author(author_id)
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя с нуля по его подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    if strategy() == PULL:
+        return
+    followed = Follow.objects.filter(user_id=user_id).values('author')
+    _insert(
+        user_id,
+        Post.objects.filter(author__in=followed).exclude(
+            author__in=popular_authors(followed)
+        ),
+    )
@@ -0,0 +1,268 @@
+"""Выгрузка и загрузка пользователей, групп, постов, комментариев и подписок.
+
+Записи читаются и пишутся потоком, без загрузки всего набора в память:
+
+* JSON Lines — один файл, по объекту на строку в формате записей
+  фикстур Django: {"model": "posts.post", "pk": 1, "fields": {...}};
+* CSV — каталог с файлом на модель (users.csv, posts.csv, ...), первая
+  колонка — pk, внешние ключи хранятся как id.
+
+Модели идут в порядке MODELS, а записи — по pk, чтобы внешние ключи
+(в том числе ответов на комментарии) ссылались на уже загруженные записи.
+Загрузка идёт пачками через bulk_create в отдельных транзакциях; сигналы
+при этом не вызываются, поэтому счётчики и ленты подписок пересчитываются
+после загрузки (import_posts).
+"""
+import contextlib
+import csv
+import json
+import os
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from . import thumbnails
+from .models import Comment, Follow, Group, Post
+from .paginators import CursorEncoder
+
+User = get_user_model()
+
+JSONL = 'jsonl'
+CSV = 'csv'
+FORMATS = (JSONL, CSV)
+
+MODELS = {
+    'users': (User, [
+        'username', 'password', 'first_name', 'last_name', 'email',
+        'is_staff', 'is_superuser', 'is_active', 'date_joined', 'last_login',
+    ]),
+    'groups': (Group, ['title', 'slug', 'description']),
+    'posts': (Post, [
+        'text', 'pub_date', 'author', 'group', 'image', 'image_width',
+        'image_height', 'image_size', 'image_variants',
+    ]),
+    'comments': (Comment, ['text', 'created', 'author', 'post', 'parent']),
+    'follows': (Follow, ['user', 'author']),
+}
+LABELS = {
+    model._meta.label_lower: name for name, (model, _) in MODELS.items()
+}
+
+
+def detect_format(path):
+    """Формат по пути: каталог или путь без расширения — CSV."""
+    if path == '-' or os.path.splitext(path)[1]:
+        return JSONL
+    return CSV
+
+
+# Выгрузка.
+
+def rows(name, chunk_size):
+    """Записи модели: pk и значения полей MODELS в виде для выгрузки."""
+    model, fields = MODELS[name]
+    columns = [model._meta.get_field(field).attname for field in fields]
+    return (
+        model.objects.order_by('pk')
+        .values_list('pk', *columns)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def write_jsonl(file, chunk_size, progress):
+    """Пишет все модели в файл JSON Lines; возвращает число записей."""
+    counts = Counter()
+    for name, (model, fields) in MODELS.items():
+        label = model._meta.label_lower
+        for pk, *values in rows(name, chunk_size):
+            record = {
+                'model': label, 'pk': pk, 'fields': dict(zip(fields, values))
+            }
+            file.write(json.dumps(
+                record, cls=CursorEncoder, ensure_ascii=False
+            ) + '\n')
+            counts[name] += 1
+            if counts[name] % chunk_size == 0:
+                progress(name, counts[name])
+    return counts
+
+
+def write_csv(directory, chunk_size, progress):
+    """Пишет по CSV-файлу на модель; возвращает число записей."""
+    counts = Counter()
+    os.makedirs(directory, exist_ok=True)
+    for name, (_, fields) in MODELS.items():
+        path = os.path.join(directory, f'{name}.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['pk', *fields])
+            for row in rows(name, chunk_size):
+                writer.writerow(
+                    '' if value is None else value for value in row
+                )
+                counts[name] += 1
+                if counts[name] % chunk_size == 0:
+                    progress(name, counts[name])
+    return counts
+
+
+# Загрузка.
+
+def read_jsonl(path):
+    """(имя модели, pk, поля) из файла JSON Lines; чужие модели пропускаются.
+
+    Файл фикстур .json (массив, как infra/fixtures.json) тоже читается,
+    но целиком; его записи сортируются в порядке MODELS.
+    """
+    with open(path, encoding='utf-8') as file:
+        if path.endswith('.json'):
+            records = [
+                record for record in json.load(file)
+                if record['model'] in LABELS
+            ]
+            order = list(MODELS)
+            records.sort(key=lambda r: order.index(LABELS[r['model']]))
+        else:
+            records = (json.loads(line) for line in file if line.strip())
+        for record in records:
+            name = LABELS.get(record['model'])
+            if name is not None:
+                yield name, record['pk'], record['fields']
+
+
+def read_csv(directory):
+    for name in MODELS:
+        path = os.path.join(directory, f'{name}.csv')
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                pk = row.pop('pk')
+                yield name, pk, row
+
+
+def build(name, pk, values, from_csv=False):
+    """Объект модели из выгруженных значений."""
+    model, fields = MODELS[name]
+    kwargs = {'pk': model._meta.pk.to_python(pk)}
+    for field_name in fields:
+        if field_name not in values:
+            continue
+        field = model._meta.get_field(field_name)
+        value = values[field_name]
+        # В CSV нет null: пустая строка у поля с null=True означает None.
+        if from_csv and value == '' and field.null:
+            value = None
+        target = field.target_field if field.is_relation else field
+        if value is not None:
+            value = target.to_python(value)
+        kwargs[field.attname] = value
+    return model(**kwargs)
+
+
+@contextlib.contextmanager
+def keep_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из выгрузки."""
+    fields = [
+        field
+        for model, _ in MODELS.values()
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def insert(name, objs):
+    model, _ = MODELS[name]
+    # ignore_conflicts: повторная загрузка того же набора не падает на уже
+    # загруженных записях. Счётчики пересчитываются после загрузки.
+    options = {'update_counters': False} if model is Post else {}
+    with transaction.atomic():
+        model.objects.bulk_create(objs, ignore_conflicts=True, **options)
+
+
+def load(records, batch_size, progress, from_csv=False):
+    """Загружает записи пачками.
+
+    Возвращает число записей по моделям и имена файлов картинок постов
+    вместе с их копиями.
+    """
+    counts = Counter()
+    images = []
+    batch = []
+    current = None
+    with keep_dates():
+        for name, pk, values in records:
+            if batch and (name != current or len(batch) >= batch_size):
+                insert(current, batch)
+                progress(current, counts[current])
+                batch = []
+            current = name
+            obj = build(name, pk, values, from_csv)
+            if name == 'posts' and obj.image:
+                images.append(obj.image.name)
+                images.extend(thumbnails.variant_names(obj.image_variants))
+            batch.append(obj)
+            counts[name] += 1
+        if batch:
+            insert(current, batch)
+            progress(current, counts[current])
+    reset_sequences()
+    # Путь в ветке не выгружается: он строится по parent заново.
+    if counts['comments']:
+        Comment.objects.fill_paths()
+    return counts, images
+
+
+def reset_sequences():
+    """Сдвигает автоинкремент за загруженные pk (нужно PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for model, _ in MODELS.values()]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def copy_file(source_root, name):
+    """Копирует файл в хранилище, если его там ещё нет.
+
+    Возвращает число скопированных байт или None, если файла нет в
+    source_root.
+    """
+    source = os.path.join(source_root, name)
+    if not os.path.isfile(source):
+        return None
+    if default_storage.exists(name):
+        return 0
+    with open(source, 'rb') as file:
+        default_storage.save(name, File(file))
+    return os.path.getsize(source)
+
+
+def copy_media(source_root, names, workers):
+    """Копирует файлы параллельно; возвращает (скопировано, байт, нет)."""
+    copied = size = missing = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            lambda name: copy_file(source_root, name), dict.fromkeys(names)
+        )
+        for result in results:
+            if result is None:
+                missing += 1
+            elif result:
+                copied += 1
+                size += result
+    return copied, size, missing
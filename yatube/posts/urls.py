@@ -20,11 +20,17 @@ urlpatterns = [
         views.PostEditView.as_view(),
         name='post_edit',
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.CommentListView.as_view(),
+        name='post_comments',
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.CommentCreateView.as_view(),
         name='add_comment',
     ),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('create/', views.PostCreateView.as_view(), name='post_create'),
     path('follow/', views.FollowIndexView.as_view(), name='follow_index'),
     path(
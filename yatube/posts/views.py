@@ -1,25 +1,61 @@
+from urllib.parse import urlencode
+
+from core.replicas import PrimaryWriteMixin, ReplicaReadMixin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
-from django.utils.functional import cached_property
-from django.views.generic import CreateView, DetailView, ListView, UpdateView
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.views.generic import (
+    CreateView, DetailView, ListView, UpdateView, View,
+)
 
+from . import counters, follows, search, timelines
+from .cache import AnonymousPageCacheMixin, fragment
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Group, Post
+from .paginators import CursorPaginationMixin, CursorPaginator
 
 User = get_user_model()
 
+COMMENTS_PER_PAGE = 20
+REPLIES_PER_THREAD = 10
+REPLIES_ORDERING = ('path',)
+
 
-class IndexView(ListView):
+class IndexView(
+    ReplicaReadMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView
+):
 
     template_name = 'posts/index.html'
     model = Post
     paginate_by = 10
     context_object_name = 'posts'
+    show_approximate_count = True
 
+    def get_queryset(self):
+        return Post.objects.for_feed()
+
+    def get_approximate_count(self, paginator):
+        # Без оценки планировщика (не PostgreSQL) это полный COUNT(*):
+        # число постов меняется только вместе с тегом 'index', поэтому
+        # итог считается один раз на его версию.
+        return fragment(
+            'index_count', ['index'], [], lambda: paginator.approximate_count
+        )
 
-class GroupView(ListView):
+    def get_page_cache_tags(self):
+        # Новый пост сдвигает страницы по номеру, но не страницы по
+        # курсору: их тег 'index:deep' сбрасывается только правкой и
+        # удалением (см. posts.signals.invalidate_post_pages).
+        if self.cursor_kwarg in self.request.GET:
+            return ['index:deep']
+        return ['index']
+
+
+class GroupView(
+    ReplicaReadMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView
+):
 
     template_name = 'posts/group_list.html'
     paginate_by = 10
@@ -30,7 +66,10 @@ class GroupView(ListView):
         return get_object_or_404(Group, slug=self.kwargs['slug'])
 
     def get_queryset(self):
-        return self.group.posts.all()
+        return self.group.posts.for_feed()
+
+    def get_page_cache_tags(self):
+        return [f'group:{self.kwargs["slug"]}']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -38,7 +77,9 @@ class GroupView(ListView):
         return context
 
 
-class ProfileView(ListView):
+class ProfileView(
+    ReplicaReadMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView
+):
 
     template_name = 'posts/profile.html'
     paginate_by = 10
@@ -46,10 +87,16 @@ class ProfileView(ListView):
 
     @cached_property
     def author(self):
-        return get_object_or_404(User, username=self.kwargs['username'])
+        return get_object_or_404(
+            User.objects.select_related('stats'),
+            username=self.kwargs['username'],
+        )
 
     def get_queryset(self):
-        return self.author.posts.all()
+        return self.author.posts.for_feed()
+
+    def get_page_cache_tags(self):
+        return [f'profile:{self.kwargs["username"]}']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -60,30 +107,148 @@ class ProfileView(ListView):
             if user == self.author:
                 context['user_author'] = True
         context['author'] = self.author
+        context['posts_count'] = counters.for_user(self.author).posts_count
         return context
 
 
-class PostDetailView(DetailView):
+class SearchView(ListView):
+
+    template_name = 'posts/search.html'
+    paginate_by = 10
+    context_object_name = 'posts'
+    max_query_length = 200
+    groups_limit = 5
+
+    @cached_property
+    def query(self):
+        return self.request.GET.get('q', '').strip()[:self.max_query_length]
+
+    def get_queryset(self):
+        return search.posts(self.query, Post.objects.for_feed()).order_by(
+            '-rank', '-pub_date', '-pk'
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['page_query'] = urlencode({'q': self.query}) + '&'
+        if context['page_obj'].number == 1:
+            context['groups'] = search.groups(self.query)[:self.groups_limit]
+        return context
+
+
+class PostDetailView(ReplicaReadMixin, AnonymousPageCacheMixin, DetailView):
 
-    model = Post
     template_name = 'posts/post_detail.html'
     context_object_name = 'post'
     pk_url_kwarg = 'post_id'
 
+    def get_queryset(self):
+        return Post.objects.select_related('author__stats', 'group')
+
+    def get_page_cache_tags(self):
+        return [f'post:{self.kwargs["post_id"]}']
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user'] = self.request.user
-        context['posts_count'] = Post.objects.filter(
-            author=context['post'].author
-        ).count()
+        context['posts_count'] = counters.for_user(
+            context['post'].author
+        ).posts_count
+        reply_to = self.request.GET.get('reply_to', '')
+        context['reply_to'] = reply_to.isdigit() and (
+            context['post'].comments.select_related('author')
+            .filter(pk=reply_to).first()
+        )
         context['form'] = CommentForm(self.request.POST or None)
-        context['comments'] = (
-            context['post'].comments.all().order_by('-created')
+        # Первая страница веток выбирается, только если её нет в кеше
+        # фрагментов (см. post_detail.html).
+        paginator = CursorPaginator(
+            Comment.objects.filter(post_id=context['post'].pk)
+            .roots(REPLIES_PER_THREAD)
+            .only('created'),
+            COMMENTS_PER_PAGE,
+            ordering=CommentListView.cursor_ordering,
+        )
+        context['comments_page'] = SimpleLazyObject(
+            lambda: comment_threads(paginator.cursor_page())
         )
         return context
 
 
-class PostCreateView(LoginRequiredMixin, CreateView):
+def comment_threads(page):
+    """Дополняет страницу корневых комментариев ответами (page.comments).
+
+    Два запроса на страницу при любой глубине и длине веток: корни и не
+    больше REPLIES_PER_THREAD ответов каждой ветки. После последнего
+    показанного ответа длинной ветки — курсор её продолжения.
+    """
+    page.comments = Comment.objects.with_replies(page.object_list)
+    replies = CursorPaginator(
+        Comment.objects.none(), REPLIES_PER_THREAD, ordering=REPLIES_ORDERING
+    )
+    for comment in page.comments:
+        if getattr(comment, 'more_replies', False):
+            comment.replies_cursor = replies.encode_cursor(comment)
+    return page
+
+
+class CommentListView(
+    ReplicaReadMixin, AnonymousPageCacheMixin, CursorPaginationMixin, ListView
+):
+    """Следующие страницы веток фрагментом для «Показать ещё».
+
+    Страница — COMMENTS_PER_PAGE корневых комментариев с первыми ответами,
+    ветка не разрывается между страницами. С ?thread= — следующие
+    REPLIES_PER_THREAD ответов одной ветки.
+    """
+
+    template_name = 'posts/includes/comment_list.html'
+    paginate_by = COMMENTS_PER_PAGE
+    cursor_ordering = ('-created', '-pk')
+
+    @cached_property
+    def thread_id(self):
+        thread = self.request.GET.get('thread', '')
+        return int(thread) if thread.isdigit() else None
+
+    def get_queryset(self):
+        comments = Comment.objects.filter(post_id=self.kwargs['post_id'])
+        if self.thread_id:
+            return comments.filter(
+                thread_id=self.thread_id, depth__gt=0
+            ).select_related('author')
+        return comments.roots(REPLIES_PER_THREAD).only('created')
+
+    def get_paginate_by(self, queryset):
+        return REPLIES_PER_THREAD if self.thread_id else COMMENTS_PER_PAGE
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        if self.thread_id:
+            return CursorPaginator(
+                queryset, per_page, ordering=REPLIES_ORDERING, **kwargs
+            )
+        return super().get_paginator(queryset, per_page, **kwargs)
+
+    def get_page_cache_tags(self):
+        return [f'post:{self.kwargs["post_id"]}']
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['post_id'] = self.kwargs['post_id']
+        page = context['page_obj']
+        if not self.thread_id:
+            context['comments_page'] = comment_threads(page)
+            return context
+        page.comments = list(page.object_list)
+        if page.next_cursor:
+            page.comments[-1].replies_cursor = page.next_cursor
+        context['thread_id'] = self.thread_id
+        context['comments_page'] = page
+        return context
+
+
+class PostCreateView(LoginRequiredMixin, PrimaryWriteMixin, CreateView):
 
     template_name = 'posts/create_post.html'
     model = Post
@@ -101,7 +266,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         )
 
 
-class PostEditView(LoginRequiredMixin, UpdateView):
+class PostEditView(LoginRequiredMixin, PrimaryWriteMixin, UpdateView):
 
     template_name = 'posts/create_post.html'
     model = Post
@@ -124,7 +289,7 @@ class PostEditView(LoginRequiredMixin, UpdateView):
         )
 
 
-class CommentCreateView(LoginRequiredMixin, CreateView):
+class CommentCreateView(LoginRequiredMixin, PrimaryWriteMixin, CreateView):
 
     form_class = CommentForm
 
@@ -137,6 +302,12 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         self.object = form.save(commit=False)
         self.object.author = self.request.user
         self.object.post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        # Ответ: родитель из скрытого поля parent, только из того же поста.
+        parent = self.request.POST.get('parent', '')
+        if parent.isdigit():
+            self.object.parent = get_object_or_404(
+                Comment, pk=parent, post=self.object.post
+            )
         self.object.save()
         return super(CommentCreateView, self).form_valid(form)
 
@@ -146,31 +317,46 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         )
 
 
-class FollowIndexView(LoginRequiredMixin, ListView):
+class FollowIndexView(
+    ReplicaReadMixin, LoginRequiredMixin, CursorPaginationMixin, ListView
+):
 
     template_name = 'posts/follow.html'
     paginate_by = 10
     context_object_name = 'posts'
 
     def get_queryset(self):
-        return Post.objects.filter(author__following__user=self.request.user)
+        return timelines.feed(self.request.user)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return timelines.paginator(self.request.user, per_page, **kwargs)
 
 
-class ProfileFollowView(LoginRequiredMixin, ListView):
-    def get(self, *args, **kwargs):
-        user = self.request.user
-        author = get_object_or_404(User, username=self.kwargs['username'])
-        if user != author:
-            Follow.objects.get_or_create(user=user, author=author)
+class ProfileFollowView(LoginRequiredMixin, PrimaryWriteMixin, View):
+    """Подписка на автора формой из профиля (POST).
 
-        return redirect('posts:profile', self.kwargs['username'])
+    GET выполняет то же самое: на него ведут прежние ссылки.
+    """
 
+    write_methods = ('GET', 'POST')
 
-class ProfileUnfollowView(LoginRequiredMixin, ListView):
-    def get(self, *args, **kwargs):
-        user = self.request.user
-        Follow.objects.filter(
-            user=user, author__username=self.kwargs['username']
-        ).delete()
+    def post(self, request, username):
+        author = get_object_or_404(User.objects.only('pk'), username=username)
+        follows.follow(request.user, [author.pk])
+        return redirect('posts:profile', username)
+
+    get = post
+
+
+class ProfileUnfollowView(LoginRequiredMixin, PrimaryWriteMixin, View):
+    """Отписка от автора формой из профиля (POST), GET — как в подписке."""
+
+    write_methods = ('GET', 'POST')
+
+    def post(self, request, username):
+        follows.unfollow(
+            request.user, User.objects.filter(username=username).values('pk')
+        )
+        return redirect('posts:profile', username)
 
-        return redirect('posts:profile', self.kwargs['username'])
+    get = post
@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = os.getenv('SECRET_KEY', default='secretcode'),
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = False
+DEBUG = os.getenv('DEBUG', default='0') == '1'
 
 ALLOWED_HOSTS = ['*']
 
@@ -45,10 +45,11 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,9 +57,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Панель отладки подключается только при DEBUG=1: без неё приложение и
+# промежуточный слой не загружаются и не замедляют ответы.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -98,6 +104,23 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (см. core.replicas): адреса через запятую, с теми
+# же именем БД и пользователем, что и основная. В тестах реплика — та же
+# основная БД.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')), 1
+):
+    DATABASE_REPLICAS.append(f'replica_{number}')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Сколько секунд после записи посетитель читает из основной БД.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -151,10 +174,161 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Копии картинок постов (posts.thumbnails) создаются после сохранения
+# поста в пуле из THUMBNAIL_WORKERS потоков; при THUMBNAIL_ASYNC=0 — сразу,
+# в том же процессе.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', default='2'))
+THUMBNAIL_ASYNC = os.getenv('THUMBNAIL_ASYNC', default='1') == '1'
+
+# Копии картинок постов для srcset: ширины в пикселях, форматы в порядке
+# предпочтения (неподдерживаемые Pillow пропускаются) и качество сжатия.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_QUALITY = 80
+
+# Ограничения на загружаемые картинки постов (posts.images): размер файла,
+# число пикселей (защита от «бомб распаковки») и длинная сторона, до которой
+# уменьшается оригинал.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 2560
+
+# Кеш общий для всех процессов gunicorn: CACHE_BACKEND=redis или memcached,
+# адрес в CACHE_LOCATION. Для тестов и локальной разработки есть file
+# (каталог на диске, общий для процессов одной машины) и locmem (в памяти
+# процесса). Ключи всех записей начинаются с CACHE_KEY_PREFIX, чтобы
+# несколько развёртываний могли делить один сервер кеша.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', default='locmem')
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', default='yatube')
+CACHE_MAX_CONNECTIONS = int(os.getenv('CACHE_MAX_CONNECTIONS', default='50'))
+CACHE_SOCKET_TIMEOUT = float(os.getenv('CACHE_SOCKET_TIMEOUT', default='1'))
+
+CACHE_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', default='redis://redis:6379/1'
+        ),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {
+                'max_connections': CACHE_MAX_CONNECTIONS,
+            },
+            'SOCKET_CONNECT_TIMEOUT': CACHE_SOCKET_TIMEOUT,
+            'SOCKET_TIMEOUT': CACHE_SOCKET_TIMEOUT,
+        },
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', default='memcached:11211'
+        ).split(','),
+        'OPTIONS': {
+            'socket_timeout': CACHE_SOCKET_TIMEOUT,
+        },
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', default='/tmp/yatube_cache'
+        ),
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': 60 * 10,
+    },
+    'thumbnails': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': f'{CACHE_KEY_PREFIX}:thumbnails',
+    },
 }
 
+# KV-хранилище sorl (где лежат копии картинок и их размеры): записи читаются
+# из общего кеша 'thumbnails', а при промахе — из таблицы в БД, которая
+# переживает очистку кеша.
+THUMBNAIL_KVSTORE = os.getenv(
+    'THUMBNAIL_KVSTORE',
+    default='sorl.thumbnail.kvstores.cached_db_kvstore.KVStore',
+)
+THUMBNAIL_CACHE = 'thumbnails'
+THUMBNAIL_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Кеш страниц для анонимных посетителей (posts.cache): через сколько
+# страница пересчитывается, сколько можно отдавать устаревшую и сколько
+# первых страниц главной прогревает warm_cache.
+PAGE_CACHE_TIMEOUT = 60 * 10
+PAGE_CACHE_STALE_TIMEOUT = 60 * 60
+PAGE_CACHE_INDEX_PAGES = 5
+
+# Фрагменты лент ({% feedcache %}): сколько хранится запись и через
+# сколько её пересчитывает один процесс, пока остальные отдают прежнюю.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+FRAGMENT_CACHE_REFRESH = 60 * 10
+
+# Наибольший уровень ответов на комментарии (posts.models.Comment): ответ
+# глубже становится ответом на комментарий этого уровня. Путь в ветке
+# хранит по 10 цифр на уровень, поэтому уровней не больше 24.
+COMMENT_MAX_DEPTH = 5
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+# Ленты подписок (posts.timelines): стратегия push, pull или hybrid,
+# длина материализованной ленты и число подписчиков, начиная с которого
+# посты автора подмешиваются при чтении, а не раздаются по лентам.
+FOLLOW_FEED_STRATEGY = os.getenv('FOLLOW_FEED_STRATEGY', default='hybrid')
+TIMELINE_LENGTH = 1000
+TIMELINE_TRIM_INTERVAL = 50
+TIMELINE_FANOUT_THRESHOLD = 10000
+
+# Полнотекстовый поиск (posts.search): конфигурация PostgreSQL, по
+# словарю которой слова приводятся к основе. Её же использует триггер из
+# миграции posts 0021: после смены нужна новая миграция.
+SEARCH_CONFIG = 'russian'
+
+# Замеры запросов (core.metrics): доля замеряемых запросов (0 — замеры
+# выключены), заголовок Server-Timing в их ответах, как часто итоги
+# процесса выгружаются в общий кеш и сколько там хранятся. Итоги всех
+# процессов отдаёт /metrics/ адресам из METRICS_ALLOWED_IPS и персоналу.
+PERFORMANCE_SAMPLE_RATE = float(
+    os.getenv('PERFORMANCE_SAMPLE_RATE', default='0.1')
+)
+PERFORMANCE_SERVER_TIMING = (
+    os.getenv('PERFORMANCE_SERVER_TIMING', default='1') == '1'
+)
+PERFORMANCE_METRICS_FLUSH = 10
+PERFORMANCE_METRICS_TIMEOUT = 60 * 60
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', default=','.join(INTERNAL_IPS)
+).split(',')
+
+# Журнал запросов к БД (core.querylog): запросы дольше SLOW_QUERY_MS
+# миллисекунд и виды запросов, повторившиеся за один запрос
+# NPLUSONE_THRESHOLD раз (N+1), пишутся в журнал core.querylog; 0 —
+# проверка выключена. При NPLUSONE_RAISE N+1 вызывает NPlusOneError.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', default='200'))
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', default='5'))
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', default='0') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.querylog': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}